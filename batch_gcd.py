@@ -0,0 +1,290 @@
+import argparse
+import contextlib
+import itertools
+import math
+import os
+import struct
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from rsa_from_scratch import PrivateKey, gcd, mod_inverse
+
+try:
+    import gmpy2
+    mpz = gmpy2.mpz
+except ImportError:
+    gmpy2 = None
+    mpz = int
+
+DEFAULT_E = 65537
+PARALLEL_MIN_ITEMS = 64  # smaller tree levels are computed in-process
+LEVEL_CHUNK = 4096       # items read at a time from a spilled level (even, so pairs never straddle chunks)
+
+def read_moduli(path):
+    """
+    Streams (n, e) pairs from a text file: one modulus per line, optionally followed by the public
+    exponent ("n e" or "n,e"). Decimal or 0x-prefixed hex; blank lines and # comments are skipped.
+    """
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].replace(',', ' ').split()
+            if not line:
+                continue
+            n = int(line[0], 0)
+            e = int(line[1], 0) if len(line) > 1 else DEFAULT_E
+            yield n, e
+
+def _write_level(path, items):
+    """
+    Writes the numbers of an iterable to a level file as they come; the count is patched in at the end.
+    Returns the count.
+    """
+    count = 0
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<Q', 0))
+        for x in items:
+            data = int(x).to_bytes((x.bit_length() + 7) // 8, 'little')
+            f.write(struct.pack('<Q', len(data)))
+            f.write(data)
+            count += 1
+        f.seek(0)
+        f.write(struct.pack('<Q', count))
+    return count
+
+def _iter_level(path):
+    with open(path, 'rb') as f:
+        count, = struct.unpack('<Q', f.read(8))
+        for _ in range(count):
+            size, = struct.unpack('<Q', f.read(8))
+            yield mpz(int.from_bytes(f.read(size), 'little'))
+
+def _iter_chunks(items, size=LEVEL_CHUNK):
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _multiply_pairs(level):
+    return [level[i] * level[i + 1] if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+
+def _reduce_children(items):
+    """
+    items: (parent remainder, children) tuples; returns the remainder of each child's square, in order.
+    """
+    return [parent % (child * child) for parent, children in items for child in children]
+
+def _chunks(items, count):
+    size = max(1, math.ceil(len(items) / count))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+class ProductTree:
+    """
+    Product tree over the moduli; level 0 holds the moduli and the last level their product.
+    With a spill directory the moduli are streamed straight into level 0 on disk, and every level
+    and remainder level is built from the one below/above it LEVEL_CHUNK items at a time, so only
+    chunks (and the unavoidably large nodes near the root) are in memory.
+    """
+
+    def __init__(self, moduli, spill_dir=None, executor=None, workers=1):
+        self.spill_dir = spill_dir
+        self.executor = executor
+        self.workers = workers
+        self.levels = []
+        self.depth = 0
+        if spill_dir:
+            count = _write_level(self.path(0), (mpz(n) for n in moduli))
+            while count > 1:
+                level = (x for chunk in _iter_chunks(_iter_level(self.path(self.depth))) for x in self._next_level(chunk))
+                count = _write_level(self.path(self.depth + 1), level)
+                self.depth += 1
+            return
+        level = [mpz(n) for n in moduli]
+        while True:
+            self.levels.append(level)
+            if len(level) <= 1:  # the root, or no moduli at all
+                break
+            level = self._next_level(level)
+            self.depth += 1
+
+    def path(self, index, kind='level'):
+        return os.path.join(self.spill_dir, f"{kind}_{index}.bin")
+
+    def level(self, index):
+        if self.spill_dir:
+            return list(_iter_level(self.path(index)))
+        return self.levels[index]
+
+    def _next_level(self, level):
+        if self.executor is None or len(level) < PARALLEL_MIN_ITEMS:
+            return _multiply_pairs(level)
+        # Chunks of even length so every pair stays inside one chunk
+        size = max(2, math.ceil(len(level) / (4 * self.workers) / 2) * 2)
+        chunks = [level[i:i + size] for i in range(0, len(level), size)]
+        return [x for part in self.executor.map(_multiply_pairs, chunks) for x in part]
+
+    def remainders(self):
+        """
+        Remainder tree: pushes the root product down, reducing modulo the square of every node.
+        Returns P mod n_i^2 for each modulus n_i.
+        """
+        remainders = self.level(self.depth)
+        for index in range(self.depth - 1, -1, -1):
+            children = self.level(index)
+            items = [(remainders[i], children[2 * i:2 * i + 2]) for i in range(len(remainders))]
+            remainders = self._reduce(items)
+        return remainders
+
+    def _reduce(self, items):
+        if self.executor is None or len(items) < PARALLEL_MIN_ITEMS:
+            return _reduce_children(items)
+        chunks = _chunks(items, 4 * self.workers)
+        return [x for part in self.executor.map(_reduce_children, chunks) for x in part]
+
+    def spilled_remainders(self):
+        """
+        Remainder tree on disk: each remainder level is streamed from the one above it and the matching
+        tree level, and the level above is deleted once consumed. Returns the path of the file holding
+        P mod n_i^2 for each modulus, in input order.
+        """
+        parent_path = self.path(self.depth)
+        for index in range(self.depth - 1, -1, -1):
+            parents = _iter_level(parent_path)
+            remainders = (x for chunk in _iter_chunks(_iter_level(self.path(index)))
+                          for x in self._reduce([(next(parents), chunk[i:i + 2]) for i in range(0, len(chunk), 2)]))
+            path = self.path(index, 'remainders')
+            _write_level(path, remainders)
+            if parent_path != self.path(self.depth):
+                os.remove(parent_path)
+            parent_path = path
+        return parent_path
+
+def _gcd(r, n):
+    return int(gmpy2.gcd(r // n, n)) if gmpy2 else math.gcd(r // n, n)
+
+def iter_batch_gcd(moduli, spill_dir=None, workers=None):
+    """
+    Bernstein's batch GCD: yields (n_i, gcd(n_i, product of all other moduli)) for every modulus, in order,
+    in quasi-linear time. A gcd other than 1 means n_i shares a prime with another modulus.
+    With a spill directory, moduli may be a stream: they go straight to disk and the gcds are computed
+    one chunk of level 0 at a time, so the corpus is never held in memory.
+    """
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        tree = ProductTree(moduli, spill_dir, executor, workers)
+        if spill_dir:
+            remainders = _iter_level(tree.spilled_remainders())
+            for chunk in _iter_chunks(_iter_level(tree.path(0))):
+                for n in chunk:
+                    yield int(n), _gcd(next(remainders), n)
+        else:
+            for r, n in zip(tree.remainders(), tree.level(0)):
+                yield int(n), _gcd(r, n)
+    finally:
+        if executor:
+            executor.shutdown()
+
+def batch_gcd(moduli, spill_dir=None, workers=None):
+    """
+    List form of iter_batch_gcd: the gcd for each modulus.
+    """
+    return [g for _, g in iter_batch_gcd(moduli, spill_dir, workers)]
+
+def _split_full_gcds(vulnerable):
+    """
+    vulnerable: {index: (n, gcd)} for the moduli with a gcd other than 1.
+    A gcd equal to n means both primes of n are shared (or n is duplicated).
+    Such moduli are split with direct pairwise gcds against the other vulnerable moduli.
+    Returns {index: gcd}.
+    """
+    moduli = [n for n, _ in vulnerable.values()]
+    result = {}
+    for index, (n, g) in vulnerable.items():
+        if g == n:
+            g = next((h for h in (math.gcd(n, m) for m in moduli) if 1 < h < n), n)
+        result[index] = g
+    return result
+
+def recover_keypair(n, e, p):
+    """
+    Rebuilds the key pair of a factored modulus in the ((e, n), (d, n)) layout of generate_keypair,
+    with the private key in CRT form.
+    Returns None if e is not invertible modulo phi.
+    """
+    q = n // p
+    phi = (p - 1) * (q - 1)
+    if gcd(e, phi) != 1:
+        return None
+    return (e, n), PrivateKey(mod_inverse(e, phi), n, p, q)
+
+def scan(path, out_path=None, spill=False, workers=None):
+    """
+    Runs batch GCD over the moduli in 'path' and writes every factored modulus with its private key
+    to out_path (n=, p=, q=, e=, d= blocks separated by ---). Returns the number of factored moduli.
+    With spill=True the moduli are streamed from the file to disk; only the vulnerable ones are kept,
+    and their exponents are read again from the file when reporting.
+    """
+    start = time.time()
+    moduli = (n for n, _ in read_moduli(path))
+    vulnerable = {}
+    count = 0
+    with tempfile.TemporaryDirectory(prefix='batch_gcd_') if spill else contextlib.nullcontext() as spill_dir:
+        for index, (n, g) in enumerate(iter_batch_gcd(moduli, spill_dir, workers)):
+            count = index + 1
+            if g != 1:
+                vulnerable[index] = (n, g)
+    gcds = _split_full_gcds(vulnerable)
+    print(f"Batch GCD over {count} moduli from {path} finished in {time.time() - start:.4f} seconds")
+
+    factored = 0
+    out = open(out_path, 'w') if out_path else None
+    try:
+        for index, (n, e) in enumerate(read_moduli(path)):
+            if index not in gcds:
+                continue
+            g = gcds[index]
+            if g == n:
+                print(f"Modulus {n} is duplicated in the input, its factors cannot be recovered")
+                continue
+            keypair = recover_keypair(n, e, g)
+            factored += 1
+            p, q = sorted((g, n // g))
+            d = keypair[1][0] if keypair else None
+            print(f"Factored n={n}\n  p={p}\n  q={q}\n  d={d}")
+            if out:
+                out.write(f"n={n}\np={p}\nq={q}\ne={e}\nd={d}\n---\n")
+    finally:
+        if out:
+            out.close()
+    print(f"Factored {factored} of {count} moduli")
+    return factored
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Find RSA moduli that share a prime factor (batch GCD).")
+    parser.add_argument('moduli', nargs='?', help="file with one modulus per line, optionally followed by e")
+    parser.add_argument('--out', help="write the factored moduli and private keys to this file")
+    parser.add_argument('--spill', action='store_true', help="keep product tree levels on disk")
+    parser.add_argument('--workers', type=int, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    if args.moduli:
+        scan(args.moduli, args.out, args.spill, args.workers)
+    else:
+        # An empty corpus must give no gcds rather than an endless tree
+        with tempfile.TemporaryDirectory(prefix='batch_gcd_') as spill_dir:
+            assert batch_gcd([], workers=1) == batch_gcd([], spill_dir, workers=1) == []
+        # Demo: a corpus of 512-bit moduli where a few keys were generated with a repeated prime
+        from rsa_from_scratch import getUnsafePrime
+        count, weak = 2000, 5
+        primes = [getUnsafePrime(256) for _ in range(2 * count)]
+        for i in range(weak):
+            primes[4 * i + 2] = primes[4 * i]
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            for i in range(count):
+                f.write(f"{primes[2 * i] * primes[2 * i + 1]} {DEFAULT_E}\n")
+        for spill in (False, True):
+            print(f"\n--- {count} moduli, spill to disk: {spill} ---")
+            scan(f.name, spill=spill, workers=args.workers)
+        os.remove(f.name)
@@ -0,0 +1,158 @@
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from rsa_from_scratch import PrivateKey
+
+try:
+    import gmpy2
+    mpz = gmpy2.mpz
+except ImportError:
+    gmpy2 = None
+    mpz = int
+
+SHARD_MIN_KEYS = 16  # fewer keys than this are processed in-process
+
+def message_to_int(message):
+    """
+    Textbook RSA message as an integer: ints are used as is, bytes big-endian, str as UTF-8 bytes.
+    """
+    if isinstance(message, str):
+        message = message.encode()
+    if isinstance(message, (bytes, bytearray)):
+        return int.from_bytes(message, 'big')
+    return int(message)
+
+def byte_width(n):
+    return (n.bit_length() + 7) // 8
+
+def pack(values, n):
+    """
+    Values modulo n as one bytes object of fixed-width big-endian integers.
+    """
+    width = byte_width(n)
+    return b''.join(int(v).to_bytes(width, 'big') for v in values)
+
+def unpack(blob, n):
+    width = byte_width(n)
+    return [int.from_bytes(blob[i:i + width], 'big') for i in range(0, len(blob), width)]
+
+def powmod_bases(bases, exponent, modulus):
+    """
+    [b^exponent mod modulus for b in bases]. With gmpy2 one call handles the whole list: the exponent
+    is converted and recoded once, and the GIL is released while GMP works.
+    """
+    if gmpy2:
+        return gmpy2.powmod_base_list([mpz(b) for b in bases], mpz(exponent), mpz(modulus))
+    return [pow(b, exponent, modulus) for b in bases]
+
+def powmod_exponents(base, exponents, modulus):
+    """
+    [base^e mod modulus for e in exponents], sharing the base precomputation across the exponents.
+    """
+    if gmpy2:
+        return gmpy2.powmod_exp_list(mpz(base), [mpz(e) for e in exponents], mpz(modulus))
+    return [pow(base, e, modulus) for e in exponents]
+
+def _private_powmod(key, values):
+    """
+    Decrypts many values under one private key: CRT halves for a PrivateKey, full-size otherwise.
+    """
+    if not isinstance(key, PrivateKey):
+        d, n = key
+        return powmod_bases(values, d, n)
+    m1 = powmod_bases([c % key.p for c in values], key.dP, key.p)
+    m2 = powmod_bases([c % key.q for c in values], key.dQ, key.q)
+    return [b + (key.qInv * (a - b) % key.p) * key.q for a, b in zip(m1, m2)]
+
+def _encrypt_shard(messages, keys):
+    return [pack(powmod_bases(messages, e, n), n) for e, n in keys]
+
+def _decrypt_shard(items):
+    return [pack(_private_powmod(key, unpack(blob, key[1])), key[1]) for key, blob in items]
+
+def _run_sharded(function, items, make_args, workers):
+    """
+    Splits items into one shard per worker process (or runs in-process for small batches)
+    and returns the concatenated results in order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(items) < SHARD_MIN_KEYS:
+        return function(*make_args(items))
+    size = math.ceil(len(items) / workers)
+    shards = [items[i:i + size] for i in range(0, len(items), size)]
+    with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+        futures = [executor.submit(function, *make_args(shard)) for shard in shards]
+        return [blob for future in futures for blob in future.result()]
+
+def batch_encrypt(messages, keys, workers=None):
+    """
+    Textbook RSA of every message under every public key (e, n).
+    Duplicate messages and duplicate keys are computed once; key shards run in parallel processes.
+    Returns one bytes object per key holding the ciphertexts of all messages, in order,
+    each byte_width(n) bytes long (see unpack).
+    Raises ValueError if a message is negative or not smaller than some modulus.
+    """
+    distinct = list(dict.fromkeys(message_to_int(m) for m in messages))
+    index = {m: i for i, m in enumerate(distinct)}
+    order = [index[message_to_int(m)] for m in messages]
+    unique_keys = list(dict.fromkeys((int(e), int(n)) for e, n in keys))
+    if distinct and unique_keys:
+        if min(distinct) < 0:
+            raise ValueError(f"Message {min(distinct)} is negative")
+        largest = max(distinct)
+        n = min(n for _, n in unique_keys)
+        if largest >= n:
+            raise ValueError(f"Message {largest} is too large for modulus n={n}")
+
+    blobs = _run_sharded(_encrypt_shard, unique_keys, lambda shard: (distinct, shard), workers)
+    results = {}
+    for (e, n), blob in zip(unique_keys, blobs):
+        width = byte_width(n)
+        results[(e, n)] = b''.join(blob[i * width:(i + 1) * width] for i in order)
+    return [results[(int(e), int(n))] for e, n in keys]
+
+def batch_decrypt(ciphertexts, private_keys, workers=None):
+    """
+    Inverse of batch_encrypt: ciphertexts[i] is the packed output for private_keys[i].
+    PrivateKey objects (from generate_keypair) are decrypted through the CRT.
+    Returns the packed plaintext integers, one bytes object per key.
+    """
+    items = list(zip(private_keys, ciphertexts))
+    return _run_sharded(_decrypt_shard, items, lambda shard: (shard,), workers)
+
+if __name__ == '__main__':
+    from keygen_pool import KeygenPool
+    from rsa_from_scratch import private_key_from_factors
+    bits = 512
+    key_count = 200
+    corpus = [f"message {i}" for i in range(40)] * 2
+
+    with KeygenPool() as pool:
+        pairs = pool.get_prime_pairs('unsafe', bits // 2, key_count)
+    # Real-world public exponent instead of generate_keypair's random one
+    keypairs = [((65537, p * q), private_key_from_factors(65537, p, q)) for p, q in pairs]
+    publics = [public for public, _ in keypairs]
+    privates = [private for _, private in keypairs]
+    messages = [message_to_int(m) for m in corpus]
+
+    start = time.time()
+    naive = [[pow(m, e, n) for m in messages] for e, n in publics]
+    naive_time = time.time() - start
+
+    start = time.time()
+    blobs = batch_encrypt(corpus, publics)
+    batch_time = time.time() - start
+    correct = all(unpack(blob, n) == row for blob, (e, n), row in zip(blobs, publics, naive))
+
+    naive_size = sum(sys.getsizeof(row) + sum(sys.getsizeof(c) for c in row) for row in naive)
+    batch_size = sum(sys.getsizeof(blob) for blob in blobs)
+    print(f"{len(corpus)} messages x {key_count} {bits}-bit keys")
+    print(f"Nested pow() list comprehension: {naive_time:.4f} seconds, {naive_size} bytes of Python ints")
+    print(f"batch_encrypt: {batch_time:.4f} seconds ({naive_time / batch_time:.1f}x), {batch_size} bytes, correct={correct}")
+
+    start = time.time()
+    plain = batch_decrypt(blobs, privates)
+    print(f"batch_decrypt (CRT): {time.time() - start:.4f} seconds, "
+          f"round trip={all(unpack(p, n) == messages for p, (e, n) in zip(plain, publics))}")
@@ -0,0 +1,2 @@
+# Copy to config.py and fill in your own values; config.py is ignored by git
+WOLFRAM_ALPHA_APP_ID = 'YOUR_WOLFRAM_ALPHA_APP_ID'
@@ -1,30 +1,65 @@
+import random
 import time
 import subprocess
 import re
 from factordb.factordb import FactorDB
-from rsa_from_scratch import generate_keypair, encrypt, decrypt
+from rsa_from_scratch import generate_keypair, encrypt, decrypt, private_key_from_factors
+from ecm import ecm_factor
+from fermat import close_prime_factor
+from trial_division import trial_division
+from factor_cache import cached_factor, lookup
+from yafu_session import yafu_factor
 from Crypto.Util.number import getPrime
 from sympy.ntheory import factorint
 import gmpy2
 import requests
 import json
-from config import WOLFRAM_ALPHA_APP_ID
-
-def pollards_rho(n):
-    # Simple Pollard's Rho implementation for factoring n
+try:
+    from config import WOLFRAM_ALPHA_APP_ID
+except ImportError:
+    WOLFRAM_ALPHA_APP_ID = None  # no config.py: the Wolfram Alpha method is skipped
+
+def pollards_rho(n, max_attempts=20, block_size=100):
+    """
+    Pollard-Brent rho: Brent's cycle detection on x -> x^2 + c with gmpy2 mpz arithmetic.
+    The |x - y| values of a block of ~block_size steps are multiplied together before a single gcd;
+    if that gcd hits n, the block is replayed step by step. A failed run retries with a fresh random c.
+    """
     if n % 2 == 0:
         return 2
-    x = 2
-    y = 2
-    d = 1
-    f = lambda x: (x*x + 1) % n
-    while d == 1:
-        x = f(x)
-        y = f(f(y))
-        d = gcd(abs(x - y), n)
-    if d == n:
-        return None
-    return d
+    n = gmpy2.mpz(n)
+    for attempt in range(1, max_attempts + 1):
+        y = gmpy2.mpz(random.randrange(1, n))
+        c = gmpy2.mpz(random.randrange(1, n))
+        r = 1
+        product = gmpy2.mpz(1)
+        d = gmpy2.mpz(1)
+        while d == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and d == 1:
+                y_block_start = y
+                for _ in range(min(block_size, r - k)):
+                    y = (y * y + c) % n
+                    product = product * abs(x - y) % n
+                d = gmpy2.gcd(product, n)
+                k += block_size
+            r *= 2
+
+        if d == n:
+            # The block multiplied in a multiple of n: replay it with a gcd per step
+            y = y_block_start
+            while True:
+                y = (y * y + c) % n
+                d = gmpy2.gcd(abs(x - y), n)
+                if d > 1:
+                    break
+        if d != n:
+            return int(d)
+        print(f"Pollard-Brent attempt {attempt} with c={c} failed (d=n), retrying with a new c...")
+    return None
 
 def gcd(a, b):
     while b:
@@ -40,6 +75,44 @@ def break_rsa_pollards_rho(n):
     q = n // p
     return p, q
 
+def break_rsa_ecm(n):
+    print("Factoring with ECM (Montgomery curves, stage 1 + stage 2, curves run in parallel)...")
+    p = ecm_factor(n)
+    if p is None or n % p != 0:
+        print("Failed to factor n with ECM.")
+        return None
+    return p, n // p
+
+def break_rsa_fermat(n):
+    print("Factoring with Fermat's method and Hart's one line factorization (targets close primes)...")
+    p = close_prime_factor(n)
+    if p is None or n % p != 0:
+        print("Failed to factor n with Fermat/Hart: p and q are not close enough.")
+        return None
+    return p, n // p
+
+def break_rsa_siqs(n):
+    try:
+        from siqs import siqs_factor
+    except ImportError:
+        print("NumPy is not installed. Please install it with 'pip install numpy'.")
+        return None
+    print("Factoring with SIQS (self-initializing quadratic sieve, polynomials sieved in parallel)...")
+    p = siqs_factor(n)
+    if p is None or n % p != 0:
+        print("Failed to factor n with SIQS.")
+        return None
+    return p, n // p
+
+def break_rsa_portfolio(n):
+    from portfolio import run_portfolio, print_report
+    print("Racing several backends in parallel, the first verified factorization wins...")
+    factors, report = run_portfolio(n)
+    print_report(report)
+    if factors is None:
+        print("Failed to factor n with the portfolio.")
+    return factors
+
 def break_rsa_sympy(n):
     print("SymPy's factorint will automatically choose the factoring algorithm (could be trial division, Pollard's Rho, ECM, etc.)")
     factors = factorint(n) 
@@ -61,20 +134,18 @@ def break_rsa_sympy_custom(n, trial=False, rho=False, pm1=False, ecm=False):
     return None
 
 def break_rsa_trial_division(n):
-    print("Factoring with trial division only...")
-    for i in range(2, int(n ** 0.5) + 1):
-        if n % i == 0:
-            return i, n // i
+    print("Factoring with trial division only (prime table, then a mod-30 wheel)...")
+    p = trial_division(n)
+    if p is not None:
+        return p, n // p
     print("Failed to factor n with trial division.")
     return None
 
 def break_rsa_gmpy2(n):
-    print("Factoring with gmpy2 (trial division using primes)...")
-    factor = gmpy2.next_prime(1)
-    while factor * factor <= n:
-        if n % factor == 0:
-            return int(factor), int(n // factor)
-        factor = gmpy2.next_prime(factor)
+    print("Factoring with gmpy2 (trial division using primes, one gcd per chunk of primes)...")
+    p = trial_division(n)
+    if p is not None:
+        return int(p), int(n // p)
     print("Failed to factor n with gmpy2.")
     return None
 
@@ -182,6 +253,14 @@ def break_rsa_cado_nfs(n):
         print(f"An unexpected error occurred while running CADO-NFS: {e}")
         return None
 
+def break_rsa_cache(n):
+    print("Looking up n in the local factor cache (offline)...")
+    factors = lookup(n)
+    if factors and len(factors) == 2:
+        return factors[0], factors[1]
+    print("n is not in the local factor cache.")
+    return None
+
 def break_rsa_factordb(n):
     print("Factoring with factordb...")
     try:
@@ -210,45 +289,18 @@ def break_rsa_factordb(n):
         return None
 
 def break_rsa_yafu(n):
-    print("Factoring with YAFU...")
-    try:
-        command = f'yafu "factor({n})"'
-        result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=600)
-        
-        if result.returncode != 0:
-            print(f"YAFU exited with an error: {result.stderr}")
-            return None
-
-        # YAFU prints factors in the format PXX = ...
-        # We look for these lines to extract the prime factors.
-        factors = re.findall(r'P\d+ = (\d+)', result.stdout)
-        
-        if len(factors) == 2:
-            p = int(factors[0])
-            q = int(factors[1])
-            if p * q == n:
-                return p, q
-        # Handle cases where n is a product of more than two primes, find a valid pair.
-        elif len(factors) > 2:
-            primes = [int(f) for f in factors]
-            for i in range(len(primes)):
-                for j in range(i + 1, len(primes)):
-                    if primes[i] * primes[j] == n:
-                        return primes[i], primes[j]
-
-        print(f"Failed to parse factors from YAFU output.")
-        print("YAFU stdout:", result.stdout)
-        return None
-
-    except FileNotFoundError:
-        print("YAFU command not found. Please ensure it is installed and in your system's PATH.")
-        return None
-    except subprocess.TimeoutExpired:
-        print("YAFU took too long to execute and was terminated.")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred while running YAFU: {e}")
+    print("Factoring with YAFU (persistent session)...")
+    factors = yafu_factor(n)
+    if factors is None:
         return None
+    # Handle cases where n is a product of more than two primes, find a valid pair.
+    primes = [p for p, e in factors.items() for _ in range(e)]
+    for i in range(len(primes)):
+        for j in range(i + 1, len(primes)):
+            if primes[i] * primes[j] == n:
+                return primes[i], primes[j]
+    print(f"Failed to parse factors from YAFU output: {factors}")
+    return None
 
 def break_rsa_wolframalpha(n):
     print("Factoring with Wolfram Alpha...")
@@ -344,7 +396,12 @@ if __name__ == "__main__":
     print("13. CADO-NFS (standalone tool)")
     print("14. FactorDB (online database)")
     print("15. Wolfram Alpha (online API)")
-    algo_choice = input("Enter 1-15: ").strip()
+    print("16. ECM (custom implementation)")
+    print("17. SIQS (custom implementation)")
+    print("18. Portfolio (race several backends, first factor wins)")
+    print("19. Fermat / Hart (close primes)")
+    print("20. Local factor cache (offline lookup)")
+    algo_choice = input("Enter 1-20: ").strip()
 
     if algo_choice == "1":
         break_rsa = break_rsa_trial_division
@@ -391,6 +448,21 @@ if __name__ == "__main__":
     elif algo_choice == "15":
         break_rsa = break_rsa_wolframalpha
         algo_name = "Wolfram Alpha"
+    elif algo_choice == "16":
+        break_rsa = break_rsa_ecm
+        algo_name = "ECM"
+    elif algo_choice == "17":
+        break_rsa = break_rsa_siqs
+        algo_name = "SIQS"
+    elif algo_choice == "18":
+        break_rsa = break_rsa_portfolio
+        algo_name = "Portfolio"
+    elif algo_choice == "19":
+        break_rsa = break_rsa_fermat
+        algo_name = "Fermat / Hart"
+    elif algo_choice == "20":
+        break_rsa = break_rsa_cache
+        algo_name = "Local factor cache"
     else:
         print("Invalid choice. Defaulting to trial division.")
         break_rsa = break_rsa_trial_division
@@ -413,14 +485,13 @@ if __name__ == "__main__":
 
         print(f"Attempting to break RSA using {algo_name}...")
         start = time.time()
-        cracked_pq = break_rsa(n)
+        cracked_pq = cached_factor(n, break_rsa, algo_name)
         end = time.time()
         if cracked_pq:
             cracked_p, cracked_q = cracked_pq
             print(f"Cracked p: {cracked_p}, q: {cracked_q}")
-            phi = (cracked_p - 1) * (cracked_q - 1)
-            d_cracked = pow(e, -1, phi)
-            cracked_private = (d_cracked, n)
+            cracked_private = private_key_from_factors(e, cracked_p, cracked_q)
+            d_cracked = cracked_private[0]
             decrypted = decrypt(cracked_private, encrypted)
             print(f"Decrypted message with cracked key: {decrypted}")
             print(f"Cracked decryption exponent d={d_cracked}")
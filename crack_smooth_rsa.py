@@ -1,5 +1,10 @@
+import itertools
+import math
 import time
-from rsa_from_scratch import getPrimeSmooth, generate_keypair, encrypt, decrypt
+from rsa_from_scratch import generate_keypair, encrypt, decrypt, private_key_from_factors
+from keygen_pool import generate_prime_pair
+from prime_sieve import iter_primes, prime_gaps
+from factor_cache import cached_factor
 # Import all cracking algorithms from crack_rsa.py
 # Import all cracking algorithms from crack_rsa.py
 # We will only use our custom implementation for now.
@@ -18,53 +23,211 @@ from rsa_from_scratch import getPrimeSmooth, generate_keypair, encrypt, decrypt
 #     break_rsa_wolframalpha
 # )
 
-def get_small_primes(limit):
-    primes = []
-    sieve = [True] * (limit + 1)
-    for p in range(2, limit + 1):
-        if sieve[p]:
-            primes.append(p)
-            for i in range(p * p, limit + 1, p):
-                sieve[i] = False
-    return primes
+def pollards_p1_stage1_steps(prev_bound, bound):
+    """
+    Yields (p, k) for every prime p <= bound whose power p^k (on top of what prev_bound already applied)
+    is new between prev_bound and bound.
+    """
+    for p in iter_primes(2, bound):
+        if p <= prev_bound and p * p > bound:
+            continue  # no new power of p fits below bound
+        # Largest powers of p below the old and the new bound; only the extra exponent is new
+        old_power = 1
+        while old_power * p <= prev_bound:
+            old_power *= p
+        new_power = old_power
+        k = 0
+        while new_power * p <= bound:
+            new_power *= p
+            k += 1
+        if k:
+            yield p, k
 
-def break_rsa_pollards_p1_iterative(n):
+def pollards_p1_stage1(a, n, prev_bound, bound, checkpoints=None, checkpoint_every=1000):
     """
-    Tries Pollard's p-1 with increasing smoothness bounds to find the 'sweet spot'.
+    Extends a stage-1 residue from bound prev_bound to bound.
+    Every prime power p^k <= bound that was not already applied for prev_bound is raised into a.
+    If a checkpoints list is given, (step index, a) is appended to it every checkpoint_every primes.
     """
-    bound = 200  # Start with a reasonable bound
-    max_bound = 200000 # Don't search forever
+    for index, (p, k) in enumerate(pollards_p1_stage1_steps(prev_bound, bound), 1):
+        a = pow(a, p ** k, n)
+        if checkpoints is not None and index % checkpoint_every == 0:
+            checkpoints.append((index, a))
+    return a
+
+def pollards_p1_split(a, n, steps):
+    """
+    Applies the (p, k) stage-1 steps one prime at a time with an individual gcd after every multiplication.
+    Returns (gcd, p) for the first multiplication where the gcd is not 1, or (1, None).
+    """
+    for p, k in steps:
+        for _ in range(k):
+            a = pow(a, p, n)
+            g = math.gcd(a - 1, n)
+            if g != 1:
+                return g, p
+    return 1, None
+
+def pollards_p1_backtrack(a, n, prev_bound, bound, checkpoints):
+    """
+    Called when a stage 1 run from residue a ended with gcd(a-1, n) == n.
+    Rewinds to the last checkpoint where the gcd was still 1 and redoes the run from there prime by prime.
+    Returns (gcd, p) like pollards_p1_split; the gcd is n only if p-1 and q-1 were completed by the same prime p.
+    """
+    # gcd(a_i - 1, n) never shrinks along the run, so binary search for the last good checkpoint
+    start_index = 0
+    low, high = 0, len(checkpoints)
+    while low < high:
+        middle = (low + high) // 2
+        index, a_checkpoint = checkpoints[middle]
+        g = math.gcd(a_checkpoint - 1, n)
+        if 1 < g < n:
+            return g, None
+        if g == 1:
+            start_index, a = index, a_checkpoint
+            low = middle + 1
+        else:
+            high = middle
+    print(f"  Rewinding to stage 1 step {start_index} and retrying prime by prime...")
+    return pollards_p1_split(a, n, itertools.islice(pollards_p1_stage1_steps(prev_bound, bound), start_index, None))
+
+def pollards_p1_reorder(n, bound, culprit, bases=(2, 3, 5, 7, 11), max_reorders=8):
+    """
+    Handles a prime that completed p-1 and q-1 at the same step: redoes stage 1 prime by prime with the
+    colliding primes moved to the front, so that p and q are completed by different primes.
+    Other bases are tried when reordering cannot separate them (the orders of a mod p and mod q agree).
+    """
+    steps = list(pollards_p1_stage1_steps(1, bound))
+    for base in bases:
+        front = [culprit]
+        for _ in range(max_reorders):
+            print(f"  Retrying stage 1 from base a={base} with primes {front} first...")
+            ordered = sorted(steps, key=lambda step: front.index(step[0]) if step[0] in front else len(front))
+            g, p = pollards_p1_split(base, n, ordered)
+            if g != n:
+                if g != 1:
+                    return g
+                break
+            if p in front:
+                break
+            front.append(p)
+    return n
+
+def lucas_v(x, m, n):
+    """
+    Returns (V_m, V_m+1) mod n for the sequence V_0 = 2, V_1 = x, V_k+1 = x*V_k - V_k-1.
+    With x = a + 1/a this is V_k = a^k + a^-k.
+    """
+    v0, v1 = 2, x
+    for bit in bin(m)[2:]:
+        if bit == '1':
+            v0, v1 = (v0 * v1 - x) % n, (v1 * v1 - 2) % n
+        else:
+            v0, v1 = (v0 * v0 - 2) % n, (v0 * v1 - x) % n
+    return v0, v1
+
+def pollards_p1_stage2(a, n, B1, B2, D=2310, batch_size=256, check_each=False):
+    """
+    Stage 2 of Pollard's p-1: catches a single prime q in (B1, B2] on top of the B1-smooth part of p-1.
+    Baby-step/giant-step with prime pairing: every q is written as k*D +- j, and with V_m = a^m + a^-m
+    one factor V_kD - V_j vanishes mod p when a^(kD+j) or a^(kD-j) is 1 mod p, so a prime pair costs one multiplication.
+    The primes come from a precomputed gap table; one gcd is taken per batch of giant steps,
+    or after every factor with check_each=True (used to split n when a batch gcd hits n).
+    """
+    try:
+        a_inverse = pow(a, -1, n)
+    except ValueError:
+        return math.gcd(a, n)
+    first, gaps = prime_gaps(B1, B2)
+    if first is None:
+        return 1
 
-    # Need a gcd function, let's define a simple one here
-    def gcd(a, b):
-        while b:
-            a, b = b, a % b
-        return a
+    # Baby steps V_0 .. V_D/2
+    x = (a + a_inverse) % n
+    babies = [2, x]
+    for _ in range(D // 2 - 1):
+        babies.append((babies[-1] * x - babies[-2]) % n)
+    v_D = (babies[D // 2] * babies[D // 2] - 2) % n
+
+    # Giant steps V_kD, starting at the multiple of D nearest to the first prime
+    k = (first + D // 2) // D
+    v_previous, v_k = lucas_v(v_D, k - 1, n) if k else (v_D, 2)
+    used = set()
+    product = 1
+    q = first
+    for gap in itertools.chain((0,), gaps):
+        q += gap
+        while q > k * D + D // 2:
+            v_previous, v_k = v_k, (v_k * v_D - v_previous) % n
+            k += 1
+            used.clear()
+            if k % batch_size == 0:
+                g = math.gcd(product, n)
+                if g != 1:
+                    return g
+        j = abs(q - k * D)
+        if j not in used:
+            # kD - j and kD + j share this factor
+            used.add(j)
+            product = product * (v_k - babies[j]) % n
+            if check_each:
+                g = math.gcd(v_k - babies[j], n)
+                if g != 1:
+                    return g
+    return math.gcd(product, n)
+
+def break_rsa_pollards_p1_iterative(n, max_bound=2000000, stage2_multiplier=100):
+    """
+    Two-stage Pollard's p-1 with increasing smoothness bounds to find the 'sweet spot'.
+    Stage 1 continues from the previous bound's residue instead of restarting from a=2.
+    After every stage 1 a stage 2 up to B2 = stage2_multiplier * B1 looks for one larger prime factor.
+    """
+    bound = 200  # Start with a reasonable bound
+    prev_bound = 1
+    a = 2
 
     while bound <= max_bound:
-        print(f"Attempting Pollard's p-1 with bound B={bound}")
-        a = 2
-        primes = get_small_primes(bound)
-        
-        for p_prime in primes:
-            p_power = p_prime
-            while p_power * p_prime <= bound:
-                p_power *= p_prime
-            a = pow(a, p_power, n)
+        print(f"Attempting Pollard's p-1 with bound B1={bound}")
+        checkpoints = []
+        a_start = a
+        a = pollards_p1_stage1(a, n, prev_bound, bound, checkpoints)
+        g = math.gcd(a - 1, n)
 
-        g = gcd(a - 1, n)
-        
         if 1 < g < n:
-            print(f"Success! Found a factor with bound B={bound}")
+            print(f"Success! Found a factor in stage 1 with bound B1={bound}")
             return g, n // g
         elif g == n:
-            print(f"Bound B={bound} was too high (g=n). Both p-1 and q-1 are smooth to this bound. Stopping.")
+            print(f"Bound B1={bound} was too high (g=n). Both p-1 and q-1 are smooth to this bound. Backtracking.")
+            g, culprit = pollards_p1_backtrack(a_start, n, prev_bound, bound, checkpoints)
+            if g == n:
+                print(f"  p-1 and q-1 were both completed by the prime {culprit}.")
+                g = pollards_p1_reorder(n, bound, culprit)
+            if 1 < g < n:
+                print(f"Success! Found a factor by backtracking with bound B1={bound}")
+                return g, n // g
+            print(f"Backtracking could not split n with bound B1={bound}. Stopping.")
             return None
-        
+
+        B2 = stage2_multiplier * bound
+        print(f"Stage 1 found nothing (g=1). Running stage 2 with B2={B2}")
+        g = pollards_p1_stage2(a, n, bound, B2)
+        if 1 < g < n:
+            print(f"Success! Found a factor in stage 2 with bounds B1={bound}, B2={B2}")
+            return g, n // g
+        elif g == n:
+            print(f"Stage 2 with B2={B2} caught both p-1 and q-1 (g=n). Redoing it with a gcd per factor...")
+            g = pollards_p1_stage2(a, n, bound, B2, check_each=True)
+            if 1 < g < n:
+                print(f"Success! Found a factor in stage 2 with bounds B1={bound}, B2={B2}")
+                return g, n // g
+            print(f"Stage 2 could not split n with B2={B2}. Stopping.")
+            return None
+
         # If g == 1, the bound was too small. Increase it and try again.
-        print(f"Bound B={bound} was too small (g=1). Increasing bound.")
+        print(f"Bounds B1={bound}, B2={B2} were too small (g=1). Increasing bound.")
+        prev_bound = bound
         bound *= 2
-        
+
     print(f"Failed to find a factor even after increasing bound to {max_bound}.")
     return None
 
@@ -78,15 +241,9 @@ if __name__ == "__main__":
     for bits in [64, 128, 256, 512, 1024, 2048]:
         print(f"\n\n--- Testing RSA with {bits}-bit SMOOTH primes (vulnerable to Pollard's p-1) ---")
         
-        print("Generating p (this might take a while)...")
-        p = getPrimeSmooth(bits)
-        print("Generating q (this might take a while)...")
-        q = getPrimeSmooth(bits)
-        
-        while p == q:
-            print("p and q were the same, regenerating q...")
-            q = getPrimeSmooth(bits)
-            
+        print("Generating p and q in parallel (this might take a while)...")
+        p, q = generate_prime_pair('smooth', bits)
+
         public, private = generate_keypair(p, q)
         e, n = public
         d, _ = private
@@ -103,7 +260,7 @@ if __name__ == "__main__":
         for name, func in algorithms.items():
             print(f"\n--- Testing {name} ---")
             start_time = time.time()
-            cracked_pq = func(n)
+            cracked_pq = cached_factor(n, func, name)
             end_time = time.time()
             
             if cracked_pq:
@@ -117,9 +274,7 @@ if __name__ == "__main__":
                 else:
                     print("Warning: Factors do not match original primes, but their product is n.")
 
-                phi = (cracked_p - 1) * (cracked_q - 1)
-                d_cracked = pow(e, -1, phi)
-                cracked_private = (d_cracked, n)
+                cracked_private = private_key_from_factors(e, cracked_p, cracked_q)
                 decrypted = decrypt(cracked_private, encrypted_msg)
                 print(f"Decrypted message with cracked key: {decrypted}")
                 print(f"Time to break: {end_time - start_time:.6f} seconds")
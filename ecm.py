@@ -0,0 +1,234 @@
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from prime_sieve import iter_primes, prime_gaps
+
+try:
+    import gmpy2
+    mpz = gmpy2.mpz
+except ImportError:
+    gmpy2 = None
+    mpz = int
+
+# (factor digits, B1, expected curves) after the GMP-ECM recommendations.
+# Our stage 2 only goes to B2 = 100*B1, so the curve counts are on the generous side.
+ECM_SCHEDULE = [
+    (10, 200, 20),
+    (15, 2000, 40),
+    (20, 11000, 120),
+    (25, 50000, 400),
+    (30, 250000, 900),
+    (35, 1000000, 2200),
+    (40, 3000000, 6000),
+    (45, 11000000, 12000),
+]
+STAGE2_MULTIPLIER = 100
+
+class FactorFound(Exception):
+    """
+    Raised when a modular inverse fails, which means the gcd already split n.
+    """
+
+    def __init__(self, factor):
+        super().__init__(factor)
+        self.factor = factor
+
+def _inverse(a, n):
+    g = math.gcd(int(a), int(n))
+    if g != 1:
+        raise FactorFound(g)
+    return mpz(pow(int(a), -1, int(n)))
+
+def suyama_curve(sigma, n):
+    """
+    Montgomery curve and starting point from Suyama's parametrization.
+    Returns (a24, X, Z) with a24 = (A+2)/4; the group order is divisible by 12.
+    """
+    u = (sigma * sigma - 5) % n
+    v = 4 * sigma % n
+    x = u * u * u % n
+    z = v * v * v % n
+    numerator = pow(v - u, 3, n) * (3 * u + v) % n
+    denominator = 16 * x * v % n
+    a24 = numerator * _inverse(denominator, n) % n
+    return a24, x, z
+
+def xdbl(X, Z, a24, n):
+    s = (X + Z) * (X + Z) % n
+    d = (X - Z) * (X - Z) % n
+    t = s - d
+    return s * d % n, t * (d + a24 * t) % n
+
+def xadd(X1, Z1, X2, Z2, Xd, Zd, n):
+    """
+    x-only addition: P1 + P2 given the difference P1 - P2 = (Xd:Zd).
+    """
+    u = (X1 - Z1) * (X2 + Z2) % n
+    v = (X1 + Z1) * (X2 - Z2) % n
+    s = u + v
+    d = u - v
+    return Zd * s * s % n, Xd * d * d % n
+
+def ladder(k, X, Z, a24, n):
+    """
+    Montgomery ladder: x-coordinate of [k]P.
+    """
+    if k == 1:
+        return X, Z
+    R0 = (X, Z)
+    R1 = xdbl(X, Z, a24, n)
+    for bit in bin(k)[3:]:
+        if bit == '1':
+            R0 = xadd(*R0, *R1, X, Z, n)
+            R1 = xdbl(*R1, a24, n)
+        else:
+            R1 = xadd(*R0, *R1, X, Z, n)
+            R0 = xdbl(*R0, a24, n)
+    return R0
+
+def ecm_stage1(X, Z, a24, n, B1):
+    """
+    Multiplies the point by every prime power up to B1.
+    """
+    for p in iter_primes(2, B1):
+        p_power = p
+        while p_power * p <= B1:
+            p_power *= p
+        X, Z = ladder(p_power, X, Z, a24, n)
+    return X, Z
+
+def ecm_stage2(X, Z, a24, n, B1, B2, D=None):
+    """
+    Baby-step/giant-step stage 2: finds a single prime q in (B1, B2] on top of the B1-smooth group order.
+    Every q is written as k*D +- j; [kD]Q = +-[j]Q mod p makes X_kD*Z_j - X_j*Z_kD vanish, so one
+    factor covers both primes of a pair. Baby-step x-coordinates are normalized with one batch inversion.
+    Returns the gcd of the accumulated product with n.
+    """
+    if D is None:
+        D = 2310 if B1 >= 2310 // 2 else 210
+    if B1 < D // 2:
+        raise ValueError(f"B1={B1} is too small for stage 2 with D={D}")
+    first, gaps = prime_gaps(B1, B2)
+    if first is None:
+        return 1
+
+    # Baby steps [j]Q for odd j < D/2 coprime to D
+    babies_j = [j for j in range(1, D // 2, 2) if math.gcd(j, D) == 1]
+    Q2 = xdbl(X, Z, a24, n)
+    multiples = {1: (X, Z)}
+    previous, current = (X, Z), xadd(*Q2, X, Z, X, Z, n)  # [1]Q and [3]Q
+    multiples[3] = current
+    for j in range(5, D // 2, 2):
+        previous, current = current, xadd(*current, *Q2, *previous, n)
+        multiples[j] = current
+    # Normalize to Z = 1 with a single inversion (Montgomery's trick)
+    zs = [multiples[j][1] for j in babies_j]
+    prefix = [mpz(1)]
+    for z in zs:
+        prefix.append(prefix[-1] * z % n)
+    inverse = _inverse(prefix[-1], n)
+    baby_x = {}
+    for index in range(len(babies_j) - 1, -1, -1):
+        j = babies_j[index]
+        baby_x[j] = multiples[j][0] * prefix[index] % n * inverse % n
+        inverse = inverse * zs[index] % n
+
+    # Giant steps [kD]Q
+    DQ = ladder(D, X, Z, a24, n)
+    k = (first + D // 2) // D
+    R = ladder(k * D, X, Z, a24, n)
+    R_previous = ladder((k - 1) * D, X, Z, a24, n) if k > 1 else (X, Z)
+    # xadd needs the difference R - DQ = R_previous; for k == 1 the difference is [0]Q, handled by doubling
+    used = set()
+    product = mpz(1)
+    q = first
+    for gap in itertools.chain((0,), gaps):
+        q += gap
+        while q > k * D + D // 2:
+            if k == 1:
+                R_previous, R = R, xdbl(*DQ, a24, n)
+            else:
+                R_previous, R = R, xadd(*R, *DQ, *R_previous, n)
+            k += 1
+            used.clear()
+        j = abs(q - k * D)
+        if j in used or j not in baby_x:
+            continue
+        used.add(j)
+        product = product * (R[0] - baby_x[j] * R[1]) % n
+    return math.gcd(int(product), int(n))
+
+def run_curves(n, B1, B2, curves, seed=None):
+    """
+    Runs up to 'curves' random Suyama curves with bounds B1/B2. Returns a non-trivial factor or None.
+    """
+    rng = random.Random(seed)
+    n = mpz(n)
+    for _ in range(curves):
+        sigma = rng.randrange(6, 1 << 32)
+        try:
+            a24, X, Z = suyama_curve(sigma, n)
+            X, Z = ecm_stage1(X, Z, a24, n, B1)
+            g = math.gcd(int(Z), int(n))
+            if g == 1:
+                g = ecm_stage2(X, Z, a24, n, B1, B2)
+        except FactorFound as found:
+            g = found.factor
+        if 1 < g < n:
+            return g
+    return None
+
+def ecm_factor(n, max_digits=None, workers=None, curves_per_task=4):
+    """
+    Lenstra ECM with Montgomery curves. Climbs ECM_SCHEDULE from small factor sizes up to max_digits
+    (default: half the digits of n), running the curves of each level across a process pool.
+    Returns a non-trivial factor of n or None.
+    """
+    if n % 2 == 0:
+        return 2
+    if max_digits is None:
+        max_digits = (len(str(n)) + 1) // 2
+    workers = workers or os.cpu_count() or 1
+
+    for digits, B1, curves in ECM_SCHEDULE:
+        B2 = STAGE2_MULTIPLIER * B1
+        print(f"ECM: {curves} curves with B1={B1}, B2={B2} (factors up to ~{digits} digits)")
+        start = time.time()
+        if workers == 1:
+            factor = run_curves(n, B1, B2, curves)
+        else:
+            factor = _run_curves_parallel(n, B1, B2, curves, workers, curves_per_task)
+        if factor:
+            print(f"ECM found factor {factor} with B1={B1} in {time.time() - start:.4f} seconds")
+            return factor
+        if digits >= max_digits:
+            break
+    return None
+
+def _run_curves_parallel(n, B1, B2, curves, workers, curves_per_task):
+    tasks = [curves_per_task] * (curves // curves_per_task) + ([curves % curves_per_task] if curves % curves_per_task else [])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(run_curves, n, B1, B2, count, random.getrandbits(64)) for count in tasks}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    factor = future.result()
+                    if factor:
+                        return int(factor)
+        finally:
+            for future in pending:
+                future.cancel()
+    return None
+
+if __name__ == '__main__':
+    from rsa_from_scratch import getUnsafePrime
+    for bits in [24, 32, 40, 48, 56, 64]:
+        p = getUnsafePrime(bits)
+        q = getUnsafePrime(bits)
+        start = time.time()
+        factor = ecm_factor(p * q)
+        print(f"{bits}-bit primes: factor={factor}, correct={factor in (p, q)}, time={time.time() - start:.4f} seconds\n")
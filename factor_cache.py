@@ -0,0 +1,184 @@
+import functools
+import math
+import os
+import sqlite3
+import time
+from collections import Counter
+from contextlib import contextmanager
+from primality import is_probable_prime
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Shared on-disk cache of factorizations; FACTOR_CACHE= (empty) disables it
+CACHE_PATH = os.environ.get('FACTOR_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'rsa-factor-cache.sqlite'))
+MAX_CACHE_BYTES = int(os.environ.get('FACTOR_CACHE_MAX_BYTES', 64 << 20))
+ROW_OVERHEAD = 64  # rough per-row bytes on top of the stored numbers, for the size budget
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS factors (
+        n TEXT PRIMARY KEY,
+        factors TEXT NOT NULL,
+        prime INTEGER NOT NULL,
+        method TEXT,
+        seconds REAL,
+        size INTEGER NOT NULL,
+        created REAL NOT NULL,
+        last_used REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS factors_last_used ON factors (last_used)",
+]
+
+@contextmanager
+def _open(path=None):
+    """
+    Connection to the cache, held under an exclusive lock on a side file so that concurrent processes
+    never interleave a read-modify-write (store + eviction, lookup + touch).
+    """
+    path = path or CACHE_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", 'w') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        connection = sqlite3.connect(path, timeout=30)
+        try:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+def _verify(n, factors, prime):
+    if not factors or any(f <= 1 for f in factors) or math.prod(factors) != n:
+        return False
+    return not prime or all(is_probable_prime(f) for f in factors)
+
+def lookup(n, prime=False, path=None):
+    """
+    Returns the cached factors of n as a list (with multiplicity), or None.
+    With prime=True only a complete factorization into primes is accepted.
+    Factors are verified on every read; an entry that does not multiply back to n is dropped.
+    """
+    if not (path or CACHE_PATH):
+        return None
+    key = format(n, 'x')
+    with _open(path) as connection:
+        row = connection.execute("SELECT factors, prime FROM factors WHERE n = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        factors = [int(f, 16) for f in row[0].split(',')]
+        if not _verify(n, factors, row[1]):
+            print(f"Factor cache: dropping invalid entry for n={n}")
+            connection.execute("DELETE FROM factors WHERE n = ?", (key,))
+            return None
+        if prime and not row[1]:
+            return None
+        connection.execute("UPDATE factors SET last_used = ? WHERE n = ?", (time.time(), key))
+    return factors
+
+def lookup_entry(n, path=None):
+    """
+    Returns (method, seconds) of the cached factorization of n, or None.
+    """
+    if not (path or CACHE_PATH):
+        return None
+    with _open(path) as connection:
+        return connection.execute("SELECT method, seconds FROM factors WHERE n = ?", (format(n, 'x'),)).fetchone()
+
+def store(n, factors, method, seconds=None, prime=False, path=None):
+    """
+    Records a factorization of n (a list of factors with multiplicity) with the method and time that found it,
+    then evicts least recently used entries while the cache is over MAX_CACHE_BYTES.
+    A complete factorization into primes (prime=True) replaces a partial one, never the other way round.
+    """
+    if not (path or CACHE_PATH):
+        return
+    factors = sorted(int(f) for f in factors)
+    if not _verify(n, factors, False):
+        raise ValueError(f"{factors} is not a factorization of {n}")
+    key = format(n, 'x')
+    value = ','.join(format(f, 'x') for f in factors)
+    now = time.time()
+    with _open(path) as connection:
+        row = connection.execute("SELECT prime FROM factors WHERE n = ?", (key,)).fetchone()
+        if row is not None and row[0] and not prime:
+            return
+        connection.execute("INSERT OR REPLACE INTO factors VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           (key, value, int(prime), method, seconds, len(key) + len(value) + ROW_OVERHEAD, now, now))
+        _evict(connection, MAX_CACHE_BYTES)
+
+def _evict(connection, max_bytes):
+    total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM factors").fetchone()[0]
+    if total <= max_bytes:
+        return
+    doomed = []
+    for key, size in connection.execute("SELECT n, size FROM factors ORDER BY last_used"):
+        if total <= max_bytes:
+            break
+        doomed.append((key,))
+        total -= size
+    connection.executemany("DELETE FROM factors WHERE n = ?", doomed)
+
+def stats(path=None):
+    """
+    Returns (entries, bytes) currently in the cache.
+    """
+    with _open(path) as connection:
+        return connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM factors").fetchone()
+
+def cached_factor(n, backend, method):
+    """
+    Runs a break_rsa_* backend through the cache: a cached (p, q) is returned without doing any work,
+    a new result is stored with the method name and time it took.
+    """
+    factors = lookup(n)
+    if factors and len(factors) == 2:
+        entry = lookup_entry(n)
+        print(f"Factor cache hit: n was factored before by {entry[0]}" +
+              (f" in {entry[1]:.4f} seconds" if entry[1] is not None else ""))
+        return tuple(factors)
+    start = time.time()
+    result = backend(n)
+    if result:
+        p, q = result
+        if 1 < p < n and p * q == n:
+            store(n, [p, q], method, time.time() - start)
+    return result
+
+def cached_factorization(method):
+    """
+    Decorator for functions returning a complete factorization as a {prime: exponent} dict,
+    like factor_with_yafu and sympy.factorint.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(n):
+            factors = lookup(n, prime=True)
+            if factors:
+                return dict(Counter(factors))
+            start = time.time()
+            result = function(n)
+            if result and math.prod(p ** e for p, e in result.items()) == n:
+                store(n, Counter(result).elements(), method, time.time() - start, prime=True)
+            return result
+        return wrapper
+    return decorator
+
+if __name__ == '__main__':
+    from rsa_from_scratch import getUnsafePrime
+    from trial_division import trial_division
+    entries, size = stats()
+    print(f"Factor cache at {CACHE_PATH}: {entries} entries, {size} bytes (limit {MAX_CACHE_BYTES})")
+
+    def factor_by_trial_division(n):
+        p = trial_division(n)
+        return (p, n // p) if p else None
+
+    n = getUnsafePrime(26) * getUnsafePrime(26)
+    for attempt in range(2):
+        start = time.time()
+        result = cached_factor(n, factor_by_trial_division, 'trial division')
+        print(f"Attempt {attempt + 1}: {result} in {time.time() - start:.4f} seconds")
@@ -1,105 +1,188 @@
-import subprocess
+import argparse
+import contextlib
+import itertools
+import json
+import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from sympy import factorint
+from factor_cache import cached_factorization
+from rsa_from_scratch import factor_with_yafu
+from smoothness import DEFAULT_BOUND, certify, smoothness_bounds
+from yafu_session import YAFU_WORKERS, yafu_available
 
-def factor_with_yafu(n):
+CERTIFY_BATCH = 1024  # p-1 / q-1 values certified per remainder tree
+SECTION_SEPARATOR = re.compile(r'^\s*-{3,}\s*$')
+BITS_HEADER = re.compile(r'(\d+)\s*bit')
+P_VALUE = re.compile(r'\bp=(\d+)')
+Q_VALUE = re.compile(r'\bq=(\d+)')
+
+@cached_factorization('sympy')
+def factor_with_sympy(n):
+    return factorint(n)
+
+def iter_key_pairs(paths):
     """
-    Factors a number n using the YAFU command-line tool.
-    Returns a dictionary of prime factors and their exponents.
+    Streams every key pair from smooth-keys.txt-style files: sections separated by '---' lines,
+    each starting with a "<bits> bit" header and holding p= and q= somewhere in its lines.
+    Yields {'source', 'section', 'bits', 'p', 'q'}; sections without both primes are skipped.
     """
-    try:
-        command = f'yafu "factor({n})"'
-        result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=600)
-        
-        if result.returncode != 0:
-            print(f"YAFU exited with an error: {result.stderr}")
-            return None
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        with open(path, 'r') as f:
+            section, lines = 0, []
+            for line in f:
+                if SECTION_SEPARATOR.match(line):
+                    key_pair = _parse_section(path, section, lines)
+                    if key_pair:
+                        yield key_pair
+                    section, lines = section + 1, []
+                else:
+                    lines.append(line)
+            key_pair = _parse_section(path, section, lines)
+            if key_pair:
+                yield key_pair
 
-        factors_raw = re.findall(r'(?:P\d+|C) = (\d+)', result.stdout)
-        
-        factors_dict = {}
-        for f_str in factors_raw:
-            factor = int(f_str)
-            if factor > 1:
-                factors_dict[factor] = factors_dict.get(factor, 0) + 1
-        
-        if len(factors_dict) == 1 and list(factors_dict.keys())[0] == n:
-            return {}
-            
-        return factors_dict
-
-    except FileNotFoundError:
-        print("YAFU command not found. Please ensure it is installed and in your system's PATH.")
-        return None
-    except subprocess.TimeoutExpired:
-        print("YAFU took too long to execute and was terminated.")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred while running YAFU: {e}")
+def _parse_section(path, section, lines):
+    text = ''.join(lines)
+    p_match = P_VALUE.search(text)
+    q_match = Q_VALUE.search(text)
+    if not (p_match and q_match):
         return None
+    header = next((line for line in lines if line.strip()), '')
+    bits_match = BITS_HEADER.search(header)
+    bits = int(bits_match.group(1)) if bits_match else None
+    return {'source': path, 'section': section, 'bits': bits, 'p': int(p_match.group(1)), 'q': int(q_match.group(1))}
 
 def parse_smooth_keys_file(filepath):
     """
-    Parses the smooth-keys2.txt file and extracts p and q values.
-    Assumes a single 2048-bit key pair in the file.
+    Parses a smooth-keys.txt-style file and returns the list of key pairs in it.
     """
-    keys_data = []
-    p_val = None
-    q_val = None
-    bits_val = 2048 # Assuming 2048-bit as per the user's request
+    return list(iter_key_pairs(filepath))
 
-    with open(filepath, 'r') as f:
-        content = f.read()
-        
-        p_match = re.search(r'p=(\d+)', content)
-        if p_match:
-            p_val = int(p_match.group(1))
-        
-        q_match = re.search(r'q=(\d+)', content)
-        if q_match:
-            q_val = int(q_match.group(1))
-        
-        if p_val and q_val:
-            keys_data.append({'bits': bits_val, 'p': p_val, 'q': q_val})
-            
-    return keys_data
+def smoothness_report(key_pair, name, factors, method, seconds):
+    """
+    Smoothness report of p-1 or q-1 (name 'p' or 'q') of one key pair, as a JSON-serializable dict:
+    source, section, bits, prime, value, method, seconds, then either error or
+    factors, max_prime, max_prime_power, b1 and b2.
+    """
+    report = {'source': key_pair['source'], 'section': key_pair['section'], 'bits': key_pair['bits'],
+              'prime': name, 'value': key_pair[name] - 1, 'method': method, 'seconds': round(seconds, 4)}
+    if not factors:
+        report['error'] = "factorization failed"
+        return report
+    stage1, b1, b2 = smoothness_bounds(factors)
+    report.update({'factors': [[p, e] for p, e in sorted(factors.items())],
+                   'max_prime': max(factors),
+                   'max_prime_power': stage1,  # also the B1 stage 1 alone would need
+                   'b1': b1,
+                   'b2': b2})
+    return report
 
-if __name__ == "__main__":
-    filepath = "smooth-keys2.txt"
-    keys = parse_smooth_keys_file(filepath)
+def _factor_job(function, value):
+    start = time.time()
+    return function(value), time.time() - start
 
-    if not keys:
-        print(f"No keys found in {filepath}. Please ensure the file exists and is correctly formatted.")
+def analyse_key_pairs(key_pairs, workers=None, out_path=None):
+    """
+    Factors p-1 and q-1 of every key pair across a worker pool and yields smoothness reports
+    in completion order. With YAFU the jobs run on threads sharing the persistent YAFU sessions
+    (YAFU_WORKERS of them); without it SymPy runs in worker processes. Key pairs are pulled
+    lazily, so at most a few jobs per worker are in flight. Each report is appended to out_path
+    as one JSON line when given.
+    """
+    if yafu_available():
+        method, function = 'yafu', factor_with_yafu
+        workers = workers or YAFU_WORKERS
+        executor = ThreadPoolExecutor(max_workers=workers)
     else:
-        for key_pair in keys:
-            bits = key_pair['bits']
-            p = key_pair['p']
-            q = key_pair['q']
+        method, function = 'sympy', factor_with_sympy
+        workers = workers or os.cpu_count() or 1
+        executor = ProcessPoolExecutor(max_workers=workers)
 
-            if bits == 2048: # Only process 2048-bit keys
-                print(f"\n--- Analyzing {bits}-bit Primes ---")
-                print(f"p = {p}")
-                print(f"q = {q}")
+    jobs = ((key_pair, name) for key_pair in key_pairs for name in ('p', 'q'))
+    out = open(out_path, 'a') if out_path else None
+    pending = {}
+    try:
+        with executor:
+            while True:
+                for key_pair, name in jobs:
+                    pending[executor.submit(_factor_job, function, key_pair[name] - 1)] = (key_pair, name)
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key_pair, name = pending.pop(future)
+                    factors, seconds = future.result()
+                    report = smoothness_report(key_pair, name, factors, method, seconds)
+                    if out:
+                        out.write(json.dumps(report) + '\n')
+                        out.flush()
+                    yield report
+    finally:
+        for future in pending:
+            future.cancel()
+        if out:
+            out.close()
 
-            print(f"\nFactoring p-1 ({p-1})...")
-            factors_p_minus_1 = factor_with_yafu(p - 1)
-            if factors_p_minus_1:
-                sorted_factors_p = dict(sorted(factors_p_minus_1.items()))
-                print(f"  Factors of p-1: {sorted_factors_p}")
-                max_prime_factor_p = max(factors_p_minus_1.keys())
-                max_prime_power_p = max(f**e for f, e in factors_p_minus_1.items())
-                print(f"  Max prime factor of p-1: { {max_prime_factor_p} }")
-                print(f"  Max prime power of p-1: { {max_prime_power_p} }")
-            else:
-                print("  Failed to factor p-1 with YAFU.")
+def certify_key_pairs(key_pairs, bound=DEFAULT_BOUND, out_path=None):
+    """
+    Fast audit without factoring: certifies p-1 and q-1 of the key pairs in batches of CERTIFY_BATCH
+    with the batch smoothness test (see smoothness.py). Smooth values get the same report as
+    analyse_key_pairs; the others are reported as not smooth with the bit length of their cofactor.
+    """
+    jobs = ((key_pair, name) for key_pair in key_pairs for name in ('p', 'q'))
+    with open(out_path, 'a') if out_path else contextlib.nullcontext() as out:
+        while True:
+            batch = list(itertools.islice(jobs, CERTIFY_BATCH))
+            if not batch:
+                break
+            start = time.time()
+            certificates = certify([key_pair[name] - 1 for key_pair, name in batch], bound)
+            seconds = (time.time() - start) / len(batch)
+            for (key_pair, name), certificate in zip(batch, certificates):
+                if certificate['smooth']:
+                    report = smoothness_report(key_pair, name, certificate['factors'], 'smoothness', seconds)
+                else:
+                    report = smoothness_report(key_pair, name, None, 'smoothness', seconds)
+                    del report['error']
+                    report['cofactor_bits'] = certificate['cofactor'].bit_length()
+                report['smooth'] = certificate['smooth']
+                if out:
+                    out.write(json.dumps(report) + '\n')
+                    out.flush()
+                yield report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audit p-1 / q-1 smoothness of the key pairs in smooth-keys.txt-style files")
+    parser.add_argument('files', nargs='*', default=["smooth-keys.txt"])
+    parser.add_argument('--out', help="append one JSON report per line to this file")
+    parser.add_argument('--bound', type=int, help="only certify smoothness up to this bound (B2 = 100 * bound) instead of factoring")
+    parser.add_argument('--workers', type=int, help="parallel factorizations (default: YAFU_WORKERS with YAFU, CPU count without)")
+    args = parser.parse_args()
 
-            print(f"\nFactoring q-1 ({q-1})...")
-            factors_q_minus_1 = factor_with_yafu(q - 1)
-            if factors_q_minus_1:
-                sorted_factors_q = dict(sorted(factors_q_minus_1.items()))
-                print(f"  Factors of q-1: {sorted_factors_q}")
-                max_prime_factor_q = max(factors_q_minus_1.keys())
-                max_prime_power_q = max(f**e for f, e in factors_q_minus_1.items())
-                print(f"  Max prime factor of q-1: { {max_prime_factor_q} }")
-                print(f"  Max prime power of q-1: { {max_prime_power_q} }")
+    missing = [path for path in args.files if not os.path.exists(path)]
+    if missing:
+        print(f"No such file: {', '.join(missing)}")
+    else:
+        start = time.time()
+        count = 0
+        if args.bound:
+            reports = certify_key_pairs(iter_key_pairs(args.files), args.bound, args.out)
+        else:
+            reports = analyse_key_pairs(iter_key_pairs(args.files), args.workers, args.out)
+        for report in reports:
+            count += 1
+            label = f"{report['source']} #{report['section']} ({report['bits']}-bit) {report['prime']}-1"
+            if report.get('smooth') is False:
+                print(f"{label}: not {args.bound}-smooth ({report['cofactor_bits']}-bit cofactor left)")
+            elif 'error' in report:
+                print(f"{label}: failed to factor with {report['method']}")
             else:
-                print("  Failed to factor q-1 with YAFU.")
+                print(f"{label}: max prime factor {report['max_prime']}, max prime power {report['max_prime_power']}, "
+                      f"needs B1={report['b1']}, B2={report['b2']} ({report['seconds']:.4f} seconds)")
+        print(f"\n{count} values analysed in {time.time() - start:.4f} seconds")
@@ -0,0 +1,115 @@
+import math
+import time
+
+# Small moduli for the square filters; together they reject all but ~0.1% of non-squares
+SQUARE_FILTER_MODULI = (64, 63, 65, 11, 17, 19, 23)
+FERMAT_WINDOW = 4096
+FERMAT_MAX_ITERATIONS = 1 << 30
+HART_MAX_ITERATIONS = 1 << 20
+
+# SQUARES[m][r] is 1 if r is a square mod m
+SQUARES = {m: bytes(1 if any(x * x % m == r for x in range(m)) else 0 for r in range(m)) for m in SQUARE_FILTER_MODULI}
+
+def is_square(x):
+    """
+    Returns isqrt(x) if x is a perfect square, else None. Residues mod the filter moduli reject most
+    non-squares before the square root is computed.
+    """
+    if x < 0:
+        return None
+    for m in SQUARE_FILTER_MODULI:
+        if not SQUARES[m][x % m]:
+            return None
+    root = math.isqrt(x)
+    return root if root * root == x else None
+
+def _fermat_filters(n, window):
+    """
+    For each filter modulus m: a bitmask T with bit i set if (i^2 - n) mod m is a square, repeated
+    over window + m bits, so that T >> (a0 mod m) gives the candidates a0 .. a0+window-1 at once.
+    """
+    filters = []
+    for m in SQUARE_FILTER_MODULI:
+        period = sum(1 << i for i in range(m) if SQUARES[m][(i * i - n) % m])
+        repeats = -(-(window + m) // m)
+        filters.append((m, period * ((1 << (m * repeats)) - 1) // ((1 << m) - 1)))
+    return filters
+
+def fermat_factor(n, max_iterations=FERMAT_MAX_ITERATIONS, window=FERMAT_WINDOW):
+    """
+    Fermat's method: looks for a with a^2 - n = b^2, so n = (a - b)(a + b). Finds close primes
+    after about (p - q)^2 / (8 sqrt(n)) values of a, starting from ceil(sqrt(n)).
+    The values of a are tested a window at a time: the square filters are ANDed into one bitmask
+    and only the surviving candidates get an isqrt. Returns a factor or None after max_iterations values of a.
+    """
+    if n % 2 == 0:
+        return 2
+    a0 = math.isqrt(n)
+    if a0 * a0 == n:
+        return a0
+    a0 += 1
+    filters = _fermat_filters(n, window)
+    window_mask = (1 << window) - 1
+    for start in range(a0, a0 + max_iterations, window):
+        mask = window_mask
+        for m, tiled in filters:
+            mask &= tiled >> (start % m)
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            a = start + low.bit_length() - 1
+            b2 = a * a - n
+            b = math.isqrt(b2)
+            if b * b == b2:
+                return a - b if a - b > 1 else None
+    return None
+
+def hart_factor(n, max_iterations=HART_MAX_ITERATIONS):
+    """
+    Hart's one line factorization: for i = 1, 2, ... takes s = ceil(sqrt(n*i)) and checks whether
+    s^2 mod n is a square t^2; then gcd(s - t, n) is usually a factor. Catches p/q close to a ratio of
+    small integers, which plain Fermat misses.
+    """
+    for i in range(1, max_iterations + 1):
+        ni = n * i
+        s = math.isqrt(ni)
+        if s * s != ni:
+            s += 1
+        t = is_square(s * s % n)
+        if t is not None:
+            g = math.gcd(s - t, n)
+            if 1 < g < n:
+                return g
+    return None
+
+def close_prime_factor(n, fermat_iterations=FERMAT_MAX_ITERATIONS, hart_iterations=HART_MAX_ITERATIONS):
+    """
+    Fermat first, then Hart's OLF, each within its iteration budget. Returns a factor or None.
+    """
+    start = time.time()
+    p = fermat_factor(n, fermat_iterations)
+    if p:
+        print(f"Fermat found factor {p} in {time.time() - start:.4f} seconds")
+        return p
+    print(f"Fermat gave up after {fermat_iterations} iterations, trying Hart's one line factorization...")
+    p = hart_factor(n, hart_iterations)
+    if p:
+        print(f"Hart found factor {p} in {time.time() - start:.4f} seconds")
+    return p
+
+if __name__ == '__main__':
+    from sympy import nextprime
+    from rsa_from_scratch import getUnsafePrime
+    for bits in [64, 128, 256, 512, 1024]:
+        for gap_bits in [16, bits // 2, bits // 2 + 12]:
+            p = getUnsafePrime(bits)
+            q = nextprime(p + (1 << gap_bits))
+            start = time.time()
+            factor = fermat_factor(p * q)
+            print(f"{bits}-bit primes, |p-q| ~ 2^{gap_bits}: Fermat correct={factor in (p, q)}, "
+                  f"time={time.time() - start:.4f} seconds")
+        p = getUnsafePrime(bits)
+        q = nextprime(3 * p // 2)  # p/q close to 2/3: out of reach for Fermat, easy for Hart
+        start = time.time()
+        factor = hart_factor(p * q)
+        print(f"{bits}-bit primes, q ~ 3p/2: Hart correct={factor in (p, q)}, time={time.time() - start:.4f} seconds")
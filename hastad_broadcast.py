@@ -0,0 +1,94 @@
+import argparse
+import random
+import time
+from no_padding_attacks import integer_root
+from rsa_from_scratch import getUnsafePrime
+from smoothness import product_tree
+
+try:
+    import gmpy2
+    mpz = gmpy2.mpz
+except ImportError:
+    gmpy2 = None
+    mpz = int
+
+def crt(residues, moduli):
+    """
+    Chinese remaindering of many residues at once with a product tree over the pairwise coprime moduli.
+    M mod m_i^2 is pushed down the tree to get (M/m_i) mod m_i for every i, then the terms
+    r_i * (M/m_i)^-1 * M/m_i are summed bottom-up, each node combining its children as
+    x_left * M_right + x_right * M_left. Returns (x, M) with x = r_i (mod m_i) and 0 <= x < M.
+    Raises ValueError if the moduli are not pairwise coprime.
+    """
+    levels = product_tree(moduli)
+    total = levels[-1][0]
+
+    # M mod node^2 from the root down to the leaves
+    remainders = [total]
+    for level in reversed(levels[:-1]):
+        remainders = [remainders[i // 2] % (node * node) for i, node in enumerate(level)]
+
+    terms = []
+    for r, m, rem in zip(residues, levels[0], remainders):
+        cofactor = rem // m  # (M/m_i) mod m_i
+        try:
+            terms.append(mpz(r) * pow(cofactor, -1, m) % m)
+        except ValueError:
+            raise ValueError(f"Moduli are not pairwise coprime (modulus {m} shares a factor)") from None
+
+    for level in levels[:-1]:
+        terms = [terms[i] * level[i + 1] + terms[i + 1] * level[i] if i + 1 < len(level) else terms[i]
+                 for i in range(0, len(level), 2)]
+    return int(terms[0] % total), int(total)
+
+def hastad_broadcast(ciphertexts, moduli, e):
+    """
+    Håstad's broadcast attack: the same message m sent unpadded to e recipients with public exponent e.
+    Since m < every n_i, m^e < n_1 * ... * n_e, so CRT gives m^e over the integers and m is its exact
+    e-th root. Uses the first e ciphertexts; returns m, or None if the root is not exact.
+    """
+    if len(ciphertexts) < e or len(moduli) < e:
+        raise ValueError(f"Need {e} ciphertexts under {e} different moduli, got {len(ciphertexts)}")
+    power, _ = crt(ciphertexts[:e], moduli[:e])
+    m, exact = integer_root(power, e)
+    return m if exact else None
+
+def broadcast(message, e, bits):
+    """
+    Encrypts message to e recipients with fresh moduli of 'bits' bits (two getUnsafePrime(bits // 2) each).
+    Returns (ciphertexts, moduli).
+    """
+    moduli = []
+    seen = set()
+    while len(moduli) < e:
+        p, q = getUnsafePrime(bits // 2), getUnsafePrime(bits // 2)
+        if p == q or p in seen or q in seen:
+            continue
+        seen.update((p, q))
+        moduli.append(p * q)
+    return [pow(message, e, n) for n in moduli], moduli
+
+def _benchmark(e, bits):
+    start = time.time()
+    message = random.getrandbits(bits - 8) | 1
+    ciphertexts, moduli = broadcast(message, e, bits)
+    setup_time = time.time() - start
+    start = time.time()
+    recovered = hastad_broadcast(ciphertexts, moduli, e)
+    attack_time = time.time() - start
+    print(f"{bits:<10} {e:<12} {setup_time:<14.4f} {attack_time:<14.6f} {recovered == message}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Håstad broadcast attack benchmark")
+    parser.add_argument('--max-e', type=int, default=257,
+                        help="largest exponent (= number of recipients) to benchmark; 65537 needs 131074 primes")
+    args = parser.parse_args()
+
+    print(f"{'Modulus':<10} {'Recipients':<12} {'Keygen (s)':<14} {'Attack (s)':<14} {'Recovered'}")
+    print("By modulus size (e=3):")
+    for bits in [512, 1024, 2048, 4096]:
+        _benchmark(3, bits)
+    print("By number of recipients (256-bit moduli):")
+    for e in [3, 5, 17, 257, 4097, 65537]:
+        if e <= args.max_e:
+            _benchmark(e, 256)
@@ -0,0 +1,145 @@
+import atexit
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from rsa_from_scratch import getPrime, getPrimeSmooth, getUnsafePrime
+from smoothness import is_p1_weak
+
+GENERATORS = {
+    'safe': getPrime,
+    'smooth': getPrimeSmooth,
+    'unsafe': getUnsafePrime,
+}
+
+# Set in each worker by the pool initializer
+_cancelled_race = None
+
+def _init_worker(cancelled_race):
+    global _cancelled_race
+    _cancelled_race = cancelled_race
+
+def _search_prime(kind, bits, race_id):
+    """
+    Worker task: runs one candidate search until it finds a prime or its race is cancelled.
+    """
+    return GENERATORS[kind](bits, stop=lambda: _cancelled_race.value >= race_id)
+
+class KeygenPool:
+    """
+    Reusable process pool that races workers on prime searches.
+    Every race gets an id; when it is won, the shared 'cancelled' counter is raised to that id
+    and the losing workers stop at their next candidate, freeing the pool for the next call.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._cancelled_race = multiprocessing.Value('q', 0)
+        self._race = 0
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self._cancelled_race,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def shutdown(self):
+        self._cancelled_race.value = self._race
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def get_primes(self, kind, bits, count, reject_p1_bound=None):
+        """
+        Returns 'count' distinct primes of the given kind ('safe', 'smooth' or 'unsafe').
+        All workers search at once; a finished worker is resubmitted until enough primes are found.
+        With reject_p1_bound, primes that Pollard's p-1 would find with B1 = reject_p1_bound
+        are discarded; each round of finished searches is certified as one batch (see smoothness.py).
+        """
+        if kind not in GENERATORS:
+            raise ValueError(f"Unknown prime kind '{kind}', expected one of {sorted(GENERATORS)}")
+        if reject_p1_bound and kind == 'smooth':
+            raise ValueError("Smooth primes are weak against Pollard's p-1 by construction")
+        self._race += 1
+        race_id = self._race
+
+        primes = []
+        pending = {self._executor.submit(_search_prime, kind, bits, race_id) for _ in range(self.workers)}
+        try:
+            while len(primes) < count:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                found = [future.result() for future in done]
+                found = [prime for prime in found if prime is not None and prime not in primes]
+                if reject_p1_bound and found:
+                    found = [prime for prime, weak in zip(found, is_p1_weak(found, reject_p1_bound)) if not weak]
+                for prime in found:
+                    if prime not in primes and len(primes) < count:
+                        primes.append(prime)
+                for _ in done:
+                    if len(primes) < count:
+                        pending.add(self._executor.submit(_search_prime, kind, bits, race_id))
+        finally:
+            # Cancel the losers: queued tasks are dropped, running ones see the counter and return None
+            self._cancelled_race.value = race_id
+            for future in pending:
+                future.cancel()
+        return primes
+
+    def get_prime(self, kind, bits, reject_p1_bound=None):
+        return self.get_primes(kind, bits, 1, reject_p1_bound)[0]
+
+    def get_prime_pair(self, kind, bits, reject_p1_bound=None):
+        """
+        Generates p and q concurrently; p != q is guaranteed.
+        """
+        p, q = self.get_primes(kind, bits, 2, reject_p1_bound)
+        return p, q
+
+    def get_prime_pairs(self, kind, bits, count, reject_p1_bound=None):
+        """
+        Bulk generation of 'count' (p, q) pairs for test moduli. All primes are distinct.
+        """
+        primes = self.get_primes(kind, bits, 2 * count, reject_p1_bound)
+        return list(zip(primes[0::2], primes[1::2]))
+
+_default_pool = None
+
+def get_default_pool():
+    """
+    Lazily created pool shared by every caller in this process; it is shut down at exit.
+    """
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = KeygenPool()
+        atexit.register(shutdown_default_pool)
+    return _default_pool
+
+def shutdown_default_pool():
+    """
+    Shuts down the default pool, if one was created; the next get_default_pool() starts a new one.
+    """
+    global _default_pool
+    if _default_pool is not None:
+        _default_pool.shutdown()
+        _default_pool = None
+
+def generate_prime_pair(kind, bits, reject_p1_bound=None):
+    return get_default_pool().get_prime_pair(kind, bits, reject_p1_bound)
+
+if __name__ == '__main__':
+    bits = 512
+    pairs = 20
+    print(f"Generating {pairs} {bits}-bit unsafe prime pairs")
+
+    start = time.time()
+    for _ in range(pairs):
+        p = getUnsafePrime(bits)
+        q = getUnsafePrime(bits)
+    single_time = time.time() - start
+    print(f"Single process: {single_time:.4f} seconds")
+
+    with KeygenPool() as pool:
+        start = time.time()
+        pool.get_prime_pairs('unsafe', bits, pairs)
+        pool_time = time.time() - start
+        print(f"KeygenPool ({pool.workers} workers): {pool_time:.4f} seconds ({single_time / pool_time:.1f}x)")
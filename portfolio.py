@@ -0,0 +1,175 @@
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+from factor_cache import store
+from crack_rsa import (
+    break_rsa_cache,
+    break_rsa_trial_division,
+    break_rsa_pollards_rho,
+    break_rsa_ecm,
+    break_rsa_fermat,
+    break_rsa_siqs,
+    break_rsa_sympy,
+    break_rsa_yafu,
+    break_rsa_cado_nfs,
+    break_rsa_factordb,
+)
+from crack_smooth_rsa import break_rsa_pollards_p1_iterative
+from yafu_session import yafu_available
+
+BACKENDS = {
+    'cache': break_rsa_cache,
+    'trial_division': break_rsa_trial_division,
+    'pollards_rho': break_rsa_pollards_rho,
+    'pollards_p1': break_rsa_pollards_p1_iterative,
+    'ecm': break_rsa_ecm,
+    'fermat': break_rsa_fermat,
+    'siqs': break_rsa_siqs,
+    'sympy': break_rsa_sympy,
+    'yafu': break_rsa_yafu,
+    'cado_nfs': break_rsa_cado_nfs,
+    'factordb': break_rsa_factordb,
+}
+# Complementary methods: smooth p-1, close primes (Fermat), small factors (rho, ECM) and balanced factors (SIQS)
+DEFAULT_BACKENDS = ['cache', 'pollards_p1', 'fermat', 'pollards_rho', 'ecm', 'siqs']
+DEFAULT_BUDGET = 300  # seconds per backend
+KILL_GRACE = 2        # seconds between SIGTERM and SIGKILL
+
+def _run_backend(name, n, results, quiet):
+    """
+    Child process: runs one backend in its own process group, so that killing the group also
+    stops the YAFU/CADO subprocesses and worker pools it started.
+    """
+    os.setpgid(0, 0)
+    if quiet:
+        devnull = open(os.devnull, 'w')
+        # At the fd level too, so YAFU/CADO and other subprocesses inheriting fds 1 and 2 stay silent
+        os.dup2(devnull.fileno(), 1)
+        os.dup2(devnull.fileno(), 2)
+        sys.stdout = sys.stderr = devnull
+    start = time.time()
+    try:
+        factors = BACKENDS[name](n)
+        results.put((name, factors, None, time.time() - start))
+    except Exception as e:
+        results.put((name, None, repr(e), time.time() - start))
+
+def _kill(process):
+    """
+    Terminates a backend and everything it spawned: SIGTERM to the process group, SIGKILL after a grace period.
+    """
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        if not process.is_alive():
+            break
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass  # the group is gone already (or not created yet): fall back to the process itself
+        if sig == signal.SIGTERM:
+            process.terminate()
+        else:
+            process.kill()
+        process.join(KILL_GRACE)
+
+def _verified(n, factors):
+    if not factors:
+        return False
+    p, q = factors
+    return 1 < p < n and p * q == n
+
+def run_portfolio(n, backends=None, budgets=None, default_budget=DEFAULT_BUDGET, stop_on_first=True, quiet=True):
+    """
+    Races several factoring backends on n, each in its own process with its own time budget.
+    With stop_on_first the first verified (p, q) wins and the other backends are killed; otherwise
+    every backend runs to completion or budget, which compares them on the same modulus.
+    Returns ((p, q) or None, report), where report maps each backend to (status, seconds);
+    for a 'factor' status the seconds are its time-to-first-factor.
+    """
+    backends = backends or default_backends()
+    budgets = budgets or {}
+    for name in backends:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown backend '{name}', expected one of {sorted(BACKENDS)}")
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+
+    start = time.time()
+    running = {}
+    for name in backends:
+        process = context.Process(target=_run_backend, args=(name, n, results, quiet), name=f"portfolio-{name}")
+        process.start()
+        try:
+            os.setpgid(process.pid, process.pid)  # also set from the parent, so an early kill finds the group
+        except (PermissionError, ProcessLookupError):
+            pass
+        running[name] = (process, start + budgets.get(name, default_budget))
+
+    winner = None
+    report = {}
+    try:
+        while running and not (winner and stop_on_first):
+            next_deadline = min(deadline for _, deadline in running.values())
+            try:
+                name, factors, error, elapsed = results.get(timeout=max(0, min(next_deadline - time.time(), 0.5)))
+            except queue.Empty:
+                name = None
+            if name in running:
+                running.pop(name)[0].join()
+                if _verified(n, factors):
+                    report[name] = ('factor', elapsed)
+                    if not winner and name != 'cache':
+                        store(n, factors, f"portfolio ({name})", elapsed)
+                    winner = winner or tuple(factors)
+                elif error:
+                    report[name] = (f'error: {error}', elapsed)
+                else:
+                    report[name] = ('failed' if not factors else 'wrong factors', elapsed)
+
+            now = time.time()
+            for name, (process, deadline) in list(running.items()):
+                if now >= deadline:
+                    _kill(process)
+                    report[name] = ('budget exceeded', now - start)
+                    del running[name]
+                elif not process.is_alive() and process.exitcode not in (0, None):
+                    report[name] = (f'crashed (exit code {process.exitcode})', now - start)
+                    del running[name]
+    finally:
+        for name, (process, _) in running.items():
+            _kill(process)
+            report[name] = ('cancelled', time.time() - start)
+        results.close()
+    return winner, report
+
+def print_report(report):
+    print(f"{'Backend':<16} | {'Result':<28} | {'Time (s)':>10}")
+    print("-" * 60)
+    for name, (status, seconds) in sorted(report.items(), key=lambda item: item[1][1]):
+        print(f"{name:<16} | {status:<28} | {seconds:>10.4f}")
+
+def default_backends():
+    """
+    DEFAULT_BACKENDS plus YAFU when it is installed.
+    """
+    return DEFAULT_BACKENDS + (['yafu'] if yafu_available() else [])
+
+if __name__ == '__main__':
+    from sympy import nextprime
+    from rsa_from_scratch import getPrimeSmooth, getUnsafePrime
+
+    bits = 64
+    p = getUnsafePrime(bits)
+    moduli = {
+        'smooth p-1': getPrimeSmooth(bits) * getPrimeSmooth(bits),
+        'close primes': p * nextprime(p + 1000),
+        'small factor': getUnsafePrime(24) * getUnsafePrime(2 * bits - 24),
+        'balanced': getUnsafePrime(bits) * getUnsafePrime(bits),
+    }
+    for label, n in moduli.items():
+        print(f"\n--- {label}: {n.bit_length()}-bit modulus ---")
+        factors, report = run_portfolio(n, default_backends(), default_budget=60, stop_on_first=False)
+        print(f"Factors: {factors}")
+        print_report(report)
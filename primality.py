@@ -0,0 +1,146 @@
+import math
+import random
+import time
+from prime_sieve import get_small_primes
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+TRIAL_DIVISION_LIMIT = 2000
+
+SMALL_PRIMES = get_small_primes(TRIAL_DIVISION_LIMIT)
+
+def jacobi(a, n):
+    """
+    Jacobi symbol (a/n) for odd positive n.
+    """
+    a %= n
+    result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+def miller_rabin(n, base=2):
+    """
+    Strong probable-prime test of odd n > 2 to the given base.
+    """
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    x = pow(base, d, n)
+    if x == 1 or x == n - 1:
+        return True
+    for _ in range(s - 1):
+        x = x * x % n
+        if x == n - 1:
+            return True
+    return False
+
+def strong_lucas(n):
+    """
+    Strong Lucas probable-prime test of odd n > 2 with Selfridge's parameters (method A).
+    """
+    if math.isqrt(n) ** 2 == n:
+        return False
+
+    # Find the first D in 5, -7, 9, -11, ... with Jacobi symbol (D/n) == -1
+    D = 5
+    while True:
+        j = jacobi(D, n)
+        if j == -1:
+            break
+        if j == 0 and abs(D) != n:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+    P = 1
+    Q = (1 - D) // 4
+
+    d = n + 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    def halve(x):
+        return (x + n if x % 2 else x) // 2 % n
+
+    # Binary ladder for U_d, V_d and Q^d, starting from k = 1
+    U, V, Qk = 1, P, Q % n
+    for bit in bin(d)[3:]:
+        U, V = U * V % n, (V * V - 2 * Qk) % n
+        Qk = Qk * Qk % n
+        if bit == '1':
+            U, V = halve(P * U + V), halve(D * U + P * V)
+            Qk = Qk * Q % n
+
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V = (V * V - 2 * Qk) % n
+        if V == 0:
+            return True
+        Qk = Qk * Qk % n
+    return False
+
+def is_probable_prime(n):
+    """
+    Baillie-PSW primality test: trial division by small primes, a base-2 Miller-Rabin round
+    and a strong Lucas test. No composite is known to pass it.
+    Uses gmpy2 for the two probable-prime tests when it is installed.
+    """
+    if n < 2:
+        return False
+    for p in SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    if n < TRIAL_DIVISION_LIMIT * TRIAL_DIVISION_LIMIT:
+        return True
+
+    if gmpy2 is not None:
+        n = gmpy2.mpz(n)
+        return bool(gmpy2.is_strong_prp(n, 2) and gmpy2.is_strong_selfridge_prp(n))
+    return miller_rabin(n, 2) and strong_lucas(n)
+
+def benchmark_keygen(bits_list=(1024, 2048), primes_per_size=3):
+    """
+    Compares prime generation throughput of the in-process engine against YAFU.
+    """
+    from rsa_from_scratch import isPrime_yafu
+    from yafu_session import yafu_available
+
+    def random_prime(bits, test):
+        tested = 0
+        while True:
+            candidate = random.getrandbits(bits) | (1 << (bits - 1)) | 1
+            tested += 1
+            if test(candidate):
+                return tested
+
+    methods = [("in-process BPSW", is_probable_prime)]
+    if yafu_available():
+        methods.append(("YAFU session", isPrime_yafu))
+    else:
+        print("YAFU not found (see YAFU_PATH), benchmarking the in-process engine only.")
+
+    for bits in bits_list:
+        print(f"\n--- {bits}-bit primes ({primes_per_size} per method) ---")
+        for name, test in methods:
+            start = time.time()
+            tested = sum(random_prime(bits, test) for _ in range(primes_per_size))
+            elapsed = time.time() - start
+            print(f"{name:<18} {elapsed:>10.4f} s total, {elapsed / primes_per_size:.4f} s per prime, "
+                  f"{tested / elapsed:.1f} candidates/s")
+
+if __name__ == '__main__':
+    benchmark_keygen()
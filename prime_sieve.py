@@ -0,0 +1,150 @@
+import atexit
+import bisect
+import itertools
+import math
+import os
+from array import array
+
+# Optional on-disk cache of the sieve, e.g. PRIME_SIEVE_CACHE=~/.cache/rsa-primes.bin
+CACHE_PATH = os.environ.get('PRIME_SIEVE_CACHE')
+CACHE_MAX_LIMIT = 10 ** 9
+CACHE_WRITE_GROWTH = 8  # rewrite the cache file mid-run only once the sieve is this many times larger
+SEGMENT_SIZE = 1 << 20
+
+# Odd-only sieve: _sieve[i] is 1 if 2*i + 1 is prime. Covers the odd numbers up to _limit.
+_sieve = bytearray(b'\x00\x01\x01\x01')  # 1, 3, 5, 7
+_limit = 7
+_cache_loaded = False
+_cache_limit = 0  # sieve limit of the cache file on disk
+
+# Memoized list of primes up to _primes_limit
+_primes = [2, 3, 5, 7]
+_primes_limit = 7
+
+def _load_cache():
+    global _sieve, _limit, _cache_loaded, _cache_limit
+    _cache_loaded = True
+    if not CACHE_PATH:
+        return
+    # Whatever happens below, the final sieve is written at exit if it outgrew the file
+    atexit.register(_save_cache_at_exit)
+    if not os.path.exists(CACHE_PATH):
+        return
+    with open(CACHE_PATH, 'rb') as f:
+        limit = int.from_bytes(f.read(8), 'little')
+        data = bytearray(f.read())
+    if len(data) == limit // 2 + 1:
+        _cache_limit = limit
+        if limit > _limit:
+            _sieve, _limit = data, limit
+
+def _save_cache_at_exit():
+    if _cache_limit < _limit <= CACHE_MAX_LIMIT:
+        save_cache()
+
+def save_cache(path=None):
+    """
+    Writes the current sieve to disk so later processes can start from it.
+    """
+    global _cache_limit
+    path = path or CACHE_PATH
+    if not path:
+        return
+    # Written to a temporary file and renamed, so a crash never leaves a truncated cache behind
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_limit.to_bytes(8, 'little'))
+            f.write(_sieve)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if path == CACHE_PATH:
+        _cache_limit = _limit
+
+def extend_sieve(limit):
+    """
+    Grows the shared sieve so it covers every number up to limit.
+    New odd numbers are sieved in segments with slice assignment, using the base primes already known.
+    """
+    global _sieve, _limit
+    if not _cache_loaded:
+        _load_cache()
+    if limit <= _limit:
+        return
+    # Grow at least geometrically so repeated small increases stay cheap; _limit is always odd
+    limit = max(limit, 2 * _limit) | 1
+    root = math.isqrt(limit)
+    extend_sieve(root)
+    base_primes = list(iter_primes(3, root))
+
+    while _limit < limit:
+        # Odd numbers start .. stop-1 of this segment
+        start = _limit + 2
+        stop = min(start + 2 * SEGMENT_SIZE, limit + 1)
+        size = (stop - start + 1) // 2
+        segment = bytearray([1]) * size
+        for p in base_primes:
+            if p * p >= stop:
+                break
+            first_multiple = max(p * p, -(-start // p) * p)
+            if first_multiple % 2 == 0:
+                first_multiple += p
+            i = (first_multiple - start) // 2
+            segment[i::p] = bytes(len(range(i, size, p)))
+        _sieve += segment
+        _limit = start + 2 * (size - 1)
+
+    # Doubling growth would otherwise rewrite the whole file on every extension; the rest is saved at exit
+    if CACHE_PATH and _limit <= CACHE_MAX_LIMIT and _limit >= CACHE_WRITE_GROWTH * max(_cache_limit, 1 << 20):
+        save_cache()
+
+def is_small_prime(n):
+    """
+    Sieve lookup for n up to the current sieve limit (which is grown if needed).
+    """
+    if n < 3:
+        return n == 2
+    extend_sieve(n)
+    return n % 2 == 1 and _sieve[n // 2] == 1
+
+def iter_primes(lo, hi):
+    """
+    Yields the primes p with lo <= p <= hi in increasing order, straight from the shared sieve.
+    """
+    extend_sieve(hi)
+    if lo <= 2 <= hi:
+        yield 2
+    first = max(lo, 3) // 2
+    last = (hi - 1) // 2
+    # Copy the sieve out in segments, so a caller extending the sieve mid-iteration is safe
+    for chunk in range(first, last + 1, SEGMENT_SIZE):
+        chunk_end = min(chunk + SEGMENT_SIZE, last + 1)
+        yield from itertools.compress(range(2 * chunk + 1, 2 * chunk_end + 1, 2), _sieve[chunk:chunk_end])
+
+def get_small_primes(limit):
+    """
+    Returns the list of primes up to limit. Results are memoized, so repeated and growing
+    limits only sieve the new part.
+    """
+    global _primes, _primes_limit
+    if limit > _primes_limit:
+        _primes.extend(iter_primes(_primes_limit + 1, limit))
+        _primes_limit = limit
+    return _primes[:bisect.bisect_right(_primes, limit)]
+
+def prime_gaps(lo, hi):
+    """
+    Returns (first prime in (lo, hi], array of gaps to each following prime up to hi).
+    The gaps table is compact (two bytes per prime) even for large hi.
+    """
+    primes = iter_primes(lo + 1, hi)
+    first = next(primes, None)
+    gaps = array('H')
+    last = first
+    for p in primes:
+        gaps.append(p - last)
+        last = p
+    return first, gaps
@@ -1,11 +1,23 @@
+import bisect
+import io
 import random
-import subprocess
-import re
+import struct
 from Crypto.Util.number import getPrime as crypto_getPrime, isPrime
+from primality import is_probable_prime
+from prime_sieve import get_small_primes
+from factor_cache import cached_factorization
+from yafu_session import yafu_factor, yafu_isprime
 
 def isPrime(n):
     """
-    YAFU-based primality test - much faster and more reliable than custom implementation.
+    In-process Baillie-PSW primality test (see primality.py).
+    """
+    return is_probable_prime(n)
+
+def isPrime_yafu(n):
+    """
+    YAFU-based primality test through the shared YAFU session (see yafu_session.py); kept for benchmarking.
+    Falls back to the in-process test when YAFU is not available.
     """
     if n <= 1:
         return False
@@ -13,104 +25,89 @@ def isPrime(n):
         return True
     if n % 2 == 0 or n % 3 == 0:
         return False
+    result = yafu_isprime(n)
+    if result is None:
+        print("YAFU not available, falling back to in-process primality test")
+        return is_probable_prime(n)
+    return result
 
-    try:
-        command = f'yafu "isprime({n})"'
-        result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=30)
-
-        if result.returncode != 0:
-            print(f"YAFU primality test failed: {result.stderr}")
-            return False
-
-        # YAFU returns "1" for prime, "0" for composite
-        return "1" in result.stdout
+# Odd primes used to sieve prime candidates before the (much more expensive) primality test
+SIEVE_PRIMES = get_small_primes(1 << 15)[1:]
+SIEVE_WINDOW = 1 << 14
 
-    except FileNotFoundError:
-        print("YAFU not found, falling back to basic primality test")
-        # Fallback to basic test
-        for i in range(5, int(n**0.5) + 1, 6):
-            if n % i == 0 or n % (i + 2) == 0:
-                return False
-        return True
-    except subprocess.TimeoutExpired:
-        print(f"YAFU primality test timed out for {n}")
-        return False
-
-def crypto_getPrime(bits):
+def sieved_candidates(bits, safe=False, max_windows=None):
     """
-    Custom prime generation - generates a random prime of specified bit length.
+    Yields odd candidates of 'bits' length that no small sieving prime divides.
+    With safe=True, 2*candidate+1 must survive the sieve as well.
+    Picks a random start and steps through consecutive offset windows, keeping residues modulo the sieving primes.
     """
+    primes = [p for p in SIEVE_PRIMES if p < 1 << (bits - 1)]
+    windows = 0
     while True:
-        # Generate random odd number of correct bit length
-        candidate = random.getrandbits(bits)
-        candidate |= (1 << (bits - 1)) | 1  # Ensure correct bit length and odd
-
+        start = random.getrandbits(bits) | (1 << (bits - 1)) | 1
+        residues = [start % p for p in primes]
+
+        while start.bit_length() == bits:
+            if max_windows is not None and windows >= max_windows:
+                return
+            windows += 1
+
+            # survivors[i] stands for the candidate start + 2*i
+            survivors = bytearray([1]) * SIEVE_WINDOW
+            for p, r in zip(primes, residues):
+                half = (p + 1) // 2  # inverse of 2 mod p
+                # start + 2*i == 0 (mod p)
+                i = -r * half % p
+                survivors[i::p] = bytes(len(range(i, SIEVE_WINDOW, p)))
+                if safe:
+                    # 2*(start + 2*i) + 1 == 0 (mod p)
+                    i = (-half - r) * half % p
+                    survivors[i::p] = bytes(len(range(i, SIEVE_WINDOW, p)))
+
+            i = survivors.find(1)
+            while i != -1:
+                candidate = start + 2 * i
+                if candidate.bit_length() != bits:
+                    break
+                yield candidate
+                i = survivors.find(1, i + 1)
+
+            start += 2 * SIEVE_WINDOW
+            residues = [(r + 2 * SIEVE_WINDOW) % p for p, r in zip(primes, residues)]
+
+def crypto_getPrime(bits, stop=None):
+    """
+    Custom prime generation - generates a random prime of specified bit length.
+    Only candidates that survive the small-prime sieve reach the primality test.
+    If given, stop() is polled per candidate and the search returns None once it is true.
+    """
+    for candidate in sieved_candidates(bits):
+        if stop is not None and stop():
+            return None
         if isPrime(candidate):
             return candidate
 
-def get_small_primes(limit):
-    primes = []
-    sieve = [True] * (limit + 1)
-    for p in range(2, limit + 1):
-        if sieve[p]:
-            primes.append(p)
-            for i in range(p * p, limit + 1, p):
-                sieve[i] = False
-    return primes
-
+@cached_factorization('yafu')
 def factor_with_yafu(n):
     """
-    Factors a number n using the YAFU command-line tool.
-    Returns a dictionary of prime factors and their exponents, similar to sympy.factorint.
+    Factors a number n using YAFU, through a long-lived YAFU session instead of a process per call.
+    Returns a dictionary of prime factors and their exponents, similar to sympy.factorint
+    ({} if YAFU could not factor n, None if YAFU failed).
     """
-    try:
-        command = f'yafu "factor({n})"'
-        result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=600)
-        
-        if result.returncode != 0:
-            print(f"YAFU exited with an error: {result.stderr}")
-            return None
+    return yafu_factor(n)
 
-        # YAFU prints factors in the format PXX = ...
-        # We look for these lines to extract the prime factors.
-        # It also prints factors in the format C = p1 * p2 * ...
-        factors_raw = re.findall(r'(?:P\d+|C) = (\d+)', result.stdout)
-        
-        factors_dict = {}
-        for f_str in factors_raw:
-            factor = int(f_str)
-            # YAFU might return composite factors if it can't fully factor.
-            # For our purpose, we need prime factors.
-            # We'll assume YAFU returns prime factors for smooth numbers.
-            # If n is large and YAFU returns a composite, this logic might need refinement.
-            if factor > 1:
-                factors_dict[factor] = factors_dict.get(factor, 0) + 1
-        
-        # If YAFU returns a single factor that is n itself, it means it couldn't factor it.
-        if len(factors_dict) == 1 and list(factors_dict.keys())[0] == n:
-            return {} # Return empty dict if not factored
-            
-        return factors_dict
-
-    except FileNotFoundError:
-        print("YAFU command not found. Please ensure it is installed and in your system's PATH.")
-        return None
-    except subprocess.TimeoutExpired:
-        print("YAFU took too long to execute and was terminated.")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred while running YAFU: {e}")
-        return None
-
-def getPrime(bits):
+def getPrime(bits, stop=None):
     """
     Generates a safe prime p of 'bits' length.
     A safe prime is a prime p where (p-1)/2 is also prime.
     This makes p-1 have a large prime factor, protecting against Pollard's p-1 attack.
     """
-    while True:
-        # Generate a random prime q of (bits-1) length
-        q = crypto_getPrime(bits - 1)
+    # q and 2*q+1 are sieved together, so only candidates where both survive get tested
+    for q in sieved_candidates(bits - 1, safe=True):
+        if stop is not None and stop():
+            return None
+        if not isPrime(q):
+            continue
         # Compute p = 2*q + 1
         p = 2 * q + 1
         # Check if p is prime and has correct bit length
@@ -119,76 +116,78 @@ def getPrime(bits):
             print(f"(p-1)/2 = {q} (also prime)")
             return p
 
-def getUnsafePrime(bits):
+def getUnsafePrime(bits, stop=None):
     """
     Generates a regular prime p of 'bits' length (not necessarily safe).
     This is vulnerable to Pollard's p-1 attack if p-1 is smooth.
     """
-    return crypto_getPrime(bits)
+    return crypto_getPrime(bits, stop=stop)
 
-def getPrimeSmooth(bits, max_attempts_per_bound=10000):
+def getPrimeSmooth(bits, max_attempts_per_bound=10000, stop=None):
     """
     Generates a prime p of 'bits' length, such that p-1 is B-smooth.
+    See getPrimeSmoothFactored, which also returns the factorization of p-1.
+    """
+    result = getPrimeSmoothFactored(bits, max_attempts_per_bound, stop=stop)
+    if result is None:
+        return None
+    return result[0]
+
+def getPrimeSmoothFactored(bits, max_attempts_per_bound=10000, max_prime_power=20000000, stop=None):
+    """
+    Generates a prime p of 'bits' length, such that p-1 is B-smooth, and returns (p, factors of p-1).
+    p-1 is built from random small primes while recording its factorization, so no factoring is needed afterwards.
+    The last cofactor is chosen so that p has exactly 'bits' bits, and no prime power above max_prime_power is ever used.
     Starts with a dynamic smoothness bound based on bit size and increases it if it fails to find a prime.
     """
     # Dynamically calculate a reasonable starting bound.
     # This is a heuristic; a larger bit size needs a larger pool of small primes to succeed in a reasonable time.
     initial_smoothness_bound = bits * 4
     print(f"Dynamically setting initial smoothness bound to {initial_smoothness_bound} for {bits}-bit prime.")
-    
+
     smoothness_bound = initial_smoothness_bound
     while True:
         small_primes = get_small_primes(smoothness_bound)
-        
+        # Leave room for one more prime below the bound as the last cofactor
+        build_bits = bits - smoothness_bound.bit_length()
+
         for _ in range(max_attempts_per_bound):
+            if stop is not None and stop():
+                return None
+
+            # Build p-1 by multiplying random small primes, keeping every prime power
+            # small enough for the p-1 attack
             p_minus_1 = 2
-            
-            target_lower = 1 << (bits - 1)
-            
-            # Build p-1 by multiplying random small primes
-            while p_minus_1.bit_length() < bits:
-                p_minus_1 *= random.choice(small_primes)
-                
-            # We might have overshot the bit length, so we can try to adjust
-            # This part is tricky, a simpler way is just to check if p is of the right bit length
-            
-            p = p_minus_1 + 1
-            
-            if p.bit_length() == bits and isPrime(p):
-                print(f"Found prime with smoothness bound: {smoothness_bound}")
-                
-                # Use YAFU for factorization
-                factors = factor_with_yafu(p-1)
-                if not factors: # YAFU failed to factor or returned empty
-                    print(f"  --- YAFU failed to factor p-1. Retrying...")
+            factors = {2: 1}
+            while p_minus_1.bit_length() < build_bits:
+                q = random.choice(small_primes)
+                if q ** (factors.get(q, 0) + 1) > max_prime_power:
+                    continue
+                p_minus_1 *= q
+                factors[q] = factors.get(q, 0) + 1
+
+            # Any last cofactor r in [lo, hi] gives p = p_minus_1*r + 1 with exactly 'bits' bits
+            lo = -(-((1 << (bits - 1)) - 1) // p_minus_1)
+            hi = ((1 << bits) - 2) // p_minus_1
+            choices = small_primes[bisect.bisect_left(small_primes, lo):bisect.bisect_right(small_primes, hi)]
+            random.shuffle(choices)
+
+            for r in choices[:64]:
+                if r ** (factors.get(r, 0) + 1) > max_prime_power:
+                    continue
+                p = p_minus_1 * r + 1
+                if not isPrime(p):
                     continue
 
+                factors[r] = factors.get(r, 0) + 1
+                factors = dict(sorted(factors.items()))
+                print(f"Found prime with smoothness bound: {smoothness_bound}")
                 print(f"  p = {p}")
                 print(f"  Factors of p-1: {factors}")
-                
-                # Ensure factors.keys() is not empty before calling max()
-                if not factors.keys():
-                    print(f"  --- Prime rejected: No prime factors found for p-1. Retrying...")
-                    continue
+                print(f"  Max prime factor of p-1 is: {max(factors)}")
+                print(f"  Max prime POWER of p-1 is: {max(f**k for f, k in factors.items())}")
+                return p, factors
 
-                max_factor = max(factors.keys())
-                print(f"  Max prime factor of p-1 is: {max_factor}")
-                
-                # This is the crucial fix: check the largest prime POWER, not just the largest prime.
-                max_prime_power = max(q**k for q, k in factors.items())
-                print(f"  Max prime POWER of p-1 is: {max_prime_power}")
-
-                # We need the max prime power to be crackable by our iterative attack.
-                # The attack stops at 200000, so we must generate a prime that respects this.
-                # Increasing this threshold to speed up prime generation for larger bit sizes.
-                if max_prime_power > 20000000: # Increased from 200,000 to 20,000,000
-                    print(f"  --- Prime rejected: Max prime power {max_prime_power} is too large to be cracked quickly. Retrying...")
-                    continue # Reject this prime and try to generate another one.
-
-                if max_factor > smoothness_bound:
-                    print(f"  *** WARNING: Max factor {max_factor} > smoothness bound {smoothness_bound}. This is a bug!")
-                return p
-        
         # If we failed to find a prime, increase the smoothness bound and try again.
         smoothness_bound *= 2
         print(f"Could not find prime with bound {smoothness_bound//2}, increasing smoothness bound to {smoothness_bound}")
@@ -216,6 +215,51 @@ def mod_inverse(encryption_exponent_e, totient_phi):
         x1 += m0
     return x1
 
+class PrivateKey(tuple):
+    """
+    Private key (d, n) that also carries p, q and the CRT parameters dP = d mod (p-1), dQ = d mod (q-1)
+    and qInv = q^-1 mod p. It is still the (d, n) tuple, so existing code can unpack and print it as before,
+    but decrypt() exponentiates modulo p and q separately, which is several times faster than pow(c, d, n).
+    """
+
+    def __new__(cls, d, n, p, q):
+        if p * q != n:
+            raise ValueError("p * q must equal n")
+        return super().__new__(cls, (d, n))
+
+    def __init__(self, d, n, p, q):
+        self.p, self.q = p, q
+        self.dP = d % (p - 1)
+        self.dQ = d % (q - 1)
+        self.qInv = pow(q, -1, p)
+
+    def __getnewargs__(self):
+        return (self[0], self[1], self.p, self.q)
+
+    def pow(self, c):
+        """
+        c^d mod n via Garner's CRT recombination.
+        """
+        m1 = pow(c, self.dP, self.p)
+        m2 = pow(c, self.dQ, self.q)
+        return m2 + (self.qInv * (m1 - m2) % self.p) * self.q
+
+def private_key_from_factors(e, p, q):
+    """
+    CRT private key for the public exponent e of n = p*q, e.g. from the factors a break_rsa_* backend found.
+    """
+    phi = (p - 1) * (q - 1)
+    return PrivateKey(pow(e, -1, phi), p * q, p, q)
+
+def private_pow(pk, c):
+    """
+    c^d mod n for a PrivateKey (CRT) or a plain (d, n) tuple.
+    """
+    if isinstance(pk, PrivateKey):
+        return pk.pow(c)
+    d, n = pk
+    return pow(c, d, n)
+
 def generate_keypair(p, q):
     """
     Generate a public/private key pair from primes p and q.
@@ -239,8 +283,8 @@ def generate_keypair(p, q):
     d = mod_inverse(e, phi)
     
     # Return public and private keypair
-    # Public key is (e, n) and private key is (d, n)
-    return ((e, n), (d, n))
+    # Public key is (e, n) and private key is (d, n), carrying p and q for CRT decryption
+    return ((e, n), PrivateKey(d, n, p, q))
 
 def encrypt(pk, plaintext):
     # Unpack the key into it's components
@@ -251,13 +295,102 @@ def encrypt(pk, plaintext):
     return cipher
 
 def decrypt(pk, ciphertext):
-    # Unpack the key into its components
-    d, n = pk
-    # Generate the plaintext based on the ciphertext and key using a^b mod m
-    plain = [chr(pow(char, d, n)) for char in ciphertext]
+    # Generate the plaintext based on the ciphertext and key using a^b mod m (CRT when the key has p and q)
+    plain = [chr(private_pow(pk, char)) for char in ciphertext]
     # Return the array of bytes as a string
     return ''.join(plain)
 
+# Block mode: a header (magic + ciphertext block size) followed by fixed-size big-endian ciphertext blocks
+BLOCK_MAGIC = b'RSAB'
+BLOCK_HEADER = struct.Struct('>4sI')
+READ_BLOCKS = 256  # plaintext blocks read from a file-like source at a time
+
+def block_sizes(n):
+    """
+    (plaintext, ciphertext) bytes per block: k = (n.bit_length()-1)//8 bytes always give an integer below n,
+    and each ciphertext integer is written with the full byte length of n.
+    """
+    k = (n.bit_length() - 1) // 8
+    if k < 1:
+        raise ValueError(f"Modulus n={n} is too small to encrypt whole bytes")
+    return k, (n.bit_length() + 7) // 8
+
+def _as_stream(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+def _read_chunks(source, size):
+    """
+    Yields pieces of exactly 'size' bytes (the last one may be shorter) from a file-like object.
+    """
+    buffer = b''
+    while True:
+        data = source.read(size * READ_BLOCKS)
+        if not data:
+            break
+        buffer += data
+        whole = len(buffer) // size * size
+        for i in range(0, whole, size):
+            yield buffer[i:i + size]
+        buffer = buffer[whole:]
+    if buffer:
+        yield buffer
+
+def encrypt_blocks(pk, source):
+    """
+    Block-mode encryption of bytes or a file-like object, as a generator of ciphertext bytes (header first).
+    The plaintext is padded ISO/IEC 7816-4 style (0x80 then zeros) and packed k bytes per integer,
+    so memory stays bounded by one read however large the input is.
+    """
+    e, n = pk
+    k, size = block_sizes(n)
+    yield BLOCK_HEADER.pack(BLOCK_MAGIC, size)
+    last = b''
+    for chunk in _read_chunks(_as_stream(source), k):
+        if len(chunk) < k:
+            last = chunk
+            break
+        yield pow(int.from_bytes(chunk, 'big'), e, n).to_bytes(size, 'big')
+    padded = last + b'\x80' + bytes(k - len(last) - 1)
+    yield pow(int.from_bytes(padded, 'big'), e, n).to_bytes(size, 'big')
+
+def decrypt_blocks(pk, source):
+    """
+    Inverse of encrypt_blocks: takes the ciphertext as bytes or a file-like object and yields plaintext bytes.
+    Raises ValueError on a malformed header, block or padding.
+    """
+    n = pk[1]
+    k, size = block_sizes(n)
+    source = _as_stream(source)
+    header = source.read(BLOCK_HEADER.size)
+    if len(header) != BLOCK_HEADER.size or BLOCK_HEADER.unpack(header) != (BLOCK_MAGIC, size):
+        raise ValueError("Not a block-mode ciphertext for this key")
+    previous = None
+    for chunk in _read_chunks(source, size):
+        c = int.from_bytes(chunk, 'big')
+        if len(chunk) != size or c >= n:
+            raise ValueError("Truncated or corrupt ciphertext block")
+        if previous is not None:
+            yield previous
+        m = private_pow(pk, c)
+        if m.bit_length() > 8 * k:
+            raise ValueError("Ciphertext block does not decrypt to a plaintext block")
+        previous = m.to_bytes(k, 'big')
+    # The final block carries the padding
+    if previous is None:
+        raise ValueError("Ciphertext has no blocks")
+    unpadded = previous.rstrip(b'\x00')
+    if not unpadded.endswith(b'\x80'):
+        raise ValueError("Invalid padding")
+    yield unpadded[:-1]
+
+def encrypt_bytes(pk, data):
+    return b''.join(encrypt_blocks(pk, data))
+
+def decrypt_bytes(pk, ciphertext):
+    return b''.join(decrypt_blocks(pk, ciphertext))
+
 if __name__ == '__main__':
     print("RSA Encrypter/ Decrypter")
 
@@ -288,6 +421,12 @@ if __name__ == '__main__':
         print("Your message is:")
         print(decrypt(private, encrypted_msg))
 
+        if public[1].bit_length() > 8:
+            encrypted_blocks = encrypt_bytes(public, message.encode())
+            print(f"Block mode ciphertext ({len(encrypted_blocks)} bytes instead of {sum((c.bit_length() + 7) // 8 for c in encrypted_msg)} in per-character integers):")
+            print(encrypted_blocks.hex())
+            print("Decrypted in block mode:", decrypt_bytes(private, encrypted_blocks).decode())
+
     elif choice == '2':
         private_key_str = input("Enter your private key (d, n): ")
         try:
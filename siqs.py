@@ -0,0 +1,451 @@
+import math
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from prime_sieve import iter_primes
+
+# (max digits of n, factor base size, sieve half-width M); the sieve covers x in [-M, M)
+SIQS_PARAMETERS = [
+    (20, 60, 1 << 12),
+    (24, 100, 1 << 13),
+    (30, 200, 1 << 14),
+    (36, 400, 1 << 15),
+    (42, 600, 1 << 15),
+    (48, 1000, 1 << 16),
+    (54, 1400, 1 << 16),
+    (60, 2200, 1 << 16),
+    (66, 3500, 1 << 17),
+    (72, 5000, 1 << 17),
+    (78, 7000, 1 << 17),
+]
+SMALL_PRIME_LIMIT = 32       # primes below this are not sieved, only trial divided
+LARGE_PRIME_MULTIPLIER = 64  # partial relations keep one cofactor up to this times the largest base prime
+THRESHOLD_SLACK = 4          # bits allowed for the unsieved small primes and rounding
+VECTOR_HITS = 32             # primes hitting the interval at most this often are sieved in one bincount
+EXTRA_RELATIONS = 20
+POLYNOMIALS_PER_TASK = 64
+
+def sqrt_mod(a, p):
+    """
+    Tonelli-Shanks: returns r with r*r = a (mod p) for an odd prime p and a quadratic residue a.
+    """
+    a %= p
+    if a == 0 or p == 2:
+        return a
+    if p % 4 == 3:
+        return pow(a, (p + 1) // 4, p)
+    q, s = p - 1, 0
+    while q % 2 == 0:
+        q //= 2
+        s += 1
+    z = 2
+    while pow(z, (p - 1) // 2, p) != p - 1:
+        z += 1
+    m, c, t, r = s, pow(z, q, p), pow(a, q, p), pow(a, (q + 1) // 2, p)
+    while t != 1:
+        i, t2 = 0, t
+        while t2 != 1:
+            t2 = t2 * t2 % p
+            i += 1
+        b = pow(c, 1 << (m - i - 1), p)
+        m, c, t, r = i, b * b % p, t * b * b % p, r * b % p
+    return r
+
+def siqs_parameters(n):
+    """
+    Returns (factor base size, M) for n from SIQS_PARAMETERS.
+    """
+    digits = len(str(n))
+    for max_digits, fb_size, M in SIQS_PARAMETERS:
+        if digits <= max_digits:
+            return fb_size, M
+    return SIQS_PARAMETERS[-1][1:]
+
+def build_factor_base(n, size):
+    """
+    The first 'size' primes p for which n is a square mod p, with sqrt(n) mod p.
+    n must not have a factor among these primes.
+    """
+    primes, roots = [], []
+    limit = 1 << 12
+    while len(primes) < size:
+        primes, roots = [], []
+        for p in iter_primes(2, limit):
+            if p == 2 or pow(n, (p - 1) // 2, p) == 1:
+                primes.append(p)
+                roots.append(sqrt_mod(n, p))
+                if len(primes) == size:
+                    break
+        limit *= 2
+    return primes, roots
+
+class SiqsContext:
+    """
+    Per-n data shared by every polynomial: the factor base as numpy arrays, sieve bounds and threshold.
+    """
+
+    def __init__(self, n, fb_size, M):
+        self.n = n
+        self.M = M
+        primes, roots = build_factor_base(n, fb_size)
+        self.primes = primes
+        self.p = np.array(primes, dtype=np.int64)
+        self.root = np.array(roots, dtype=np.int64)
+        self.logp = np.array([round(math.log2(p)) for p in primes], dtype=np.uint8)
+        self.large_prime_bound = LARGE_PRIME_MULTIPLIER * primes[-1]
+        # log2 |g(x)/A| is about log2(M * sqrt(n/2)); accept values with at most one large prime left
+        self.threshold = int(math.log2(M) + n.bit_length() / 2 - 0.5
+                             - math.log2(self.large_prime_bound) - THRESHOLD_SLACK)
+        self.target_a = math.isqrt(2 * n) // M
+
+_contexts = {}
+
+def _get_context(n, fb_size, M):
+    key = (n, fb_size, M)
+    if key not in _contexts:
+        _contexts.clear()
+        _contexts[key] = SiqsContext(n, fb_size, M)
+    return _contexts[key]
+
+def choose_a(ctx, rng, used):
+    """
+    Picks A as a product of s factor base primes close to sqrt(2n)/M, so |g(x)/A| stays small over the interval.
+    Returns the indices of the chosen primes, or None once no unused A is left.
+    """
+    primes = ctx.primes
+    first = next(i for i, p in enumerate(primes) if p >= SMALL_PRIME_LIMIT)
+    log_target = math.log(max(ctx.target_a, 2))
+    ideal = min(2000, primes[-1] // 4)
+    s = max(1, round(log_target / math.log(max(ideal, primes[first]))))
+    p_ideal = math.exp(log_target / s)
+    pool = [i for i in range(first, len(primes)) if p_ideal / 2 <= primes[i] <= 2 * p_ideal]
+    if len(pool) < s + 4:
+        pool = list(range(first, len(primes)))
+
+    for attempt in range(200):
+        if attempt == 100:
+            pool = list(range(first, len(primes)))  # small n: the pool near the ideal prime is used up
+        indices = rng.sample(pool, s - 1) if s > 1 else []
+        product = math.prod(primes[i] for i in indices)
+        # Last prime: whichever factor base prime brings A closest to the target
+        wanted = ctx.target_a / product
+        last = min((i for i in range(first, len(primes)) if i not in indices),
+                   key=lambda i: abs(math.log(primes[i] / wanted)))
+        indices = sorted(indices + [last])
+        a = product * primes[last]
+        if a not in used:
+            used.add(a)
+            return indices
+    return None
+
+def sieve_polynomials(n, fb_size, M, polynomials, seed):
+    """
+    Worker task: sieves at least 'polynomials' polynomials g(x) = (Ax + b)^2 - n with fresh values of A.
+    Returns (relations, partial relations, polynomials sieved). A relation is (u, factors) with
+    u^2 = prod(p^e) mod n; a partial relation is (large prime, u, factors) with the large prime left out.
+    """
+    ctx = _get_context(n, fb_size, M)
+    rng = random.Random(seed)
+    used = set()
+    relations, partials = [], []
+    done = 0
+    while done < polynomials:
+        a_indices = choose_a(ctx, rng, used)
+        if a_indices is None:
+            break
+        done += _sieve_a(ctx, a_indices, relations, partials)
+    return relations, partials, done
+
+def _sieve_a(ctx, a_indices, relations, partials):
+    """
+    Self-initialization: computes the roots for the first b of this A, then walks all 2^(s-1) values of b
+    in Gray code order, updating the roots with one vector addition per polynomial.
+    """
+    n, M = ctx.n, ctx.M
+    primes, p, root = ctx.primes, ctx.p, ctx.root
+    a_primes = [primes[i] for i in a_indices]
+    A = math.prod(a_primes)
+
+    # B_l = A/q_l * (sqrt(n) * (A/q_l)^-1 mod q_l), so b = sum(B_l) satisfies b^2 = n mod A
+    B = []
+    for i, q in zip(a_indices, a_primes):
+        a_q = A // q
+        gamma = int(root[i]) * pow(a_q, -1, q) % q
+        if gamma > q // 2:
+            gamma = q - gamma
+        B.append(a_q * gamma)
+    b = sum(B)
+
+    sieved = p >= SMALL_PRIME_LIMIT
+    sieved[a_indices] = False
+    a_inverse = np.array([pow(A, -1, q) if q not in a_primes else 0 for q in primes], dtype=np.int64)
+    b_mod = np.array([b % q for q in primes], dtype=np.int64)
+    soln1 = a_inverse * ((root - b_mod) % p) % p
+    soln2 = a_inverse * ((-root - b_mod) % p) % p
+    b_ainv2 = [2 * np.array([B_l % q for q in primes], dtype=np.int64) * a_inverse % p for B_l in B]
+
+    # Primes that are only trial divided: the small ones and the factors of A
+    unsieved = [q for q, flag in zip(primes, sieved) if not flag]
+    sieve_p = p[sieved]
+    sieve_logs = ctx.logp[sieved]
+    # Small primes are sieved with one strided slice each; the larger ones hit the interval only a few
+    # times, so all their positions are generated at once and summed with a single bincount
+    looped = sieve_p < 2 * M // VECTOR_HITS
+    loop_primes = sieve_p[looped].tolist()
+    loop_logs = sieve_logs[looped].tolist()
+    vector_p = sieve_p[~looped][:, None]
+    steps = vector_p * np.arange(VECTOR_HITS)
+    vector_logs = np.broadcast_to(sieve_logs[~looped][:, None], steps.shape)
+
+    count = 1 << (len(B) - 1)
+    for index in range(count):
+        if index:
+            # Gray code step: flip the sign of B_v
+            v = (index & -index).bit_length() - 1
+            sign = 1 if (index >> (v + 1)) & 1 else -1
+            b += 2 * sign * B[v]
+            soln1 = (soln1 - sign * b_ainv2[v]) % p
+            soln2 = (soln2 - sign * b_ainv2[v]) % p
+
+        s1, s2 = soln1[sieved], soln2[sieved]
+        starts1, starts2 = (s1 + M) % sieve_p, (s2 + M) % sieve_p
+        sieve = np.zeros(2 * M, dtype=np.uint8)
+        for q, log_q, start1, start2 in zip(loop_primes, loop_logs, starts1[looped].tolist(),
+                                            starts2[looped].tolist()):
+            sieve[start1::q] += log_q
+            sieve[start2::q] += log_q
+        for starts in (starts1, starts2):
+            positions = starts[~looped][:, None] + steps
+            inside = positions < 2 * M
+            sieve += np.bincount(positions[inside], weights=vector_logs[inside], minlength=2 * M).astype(np.uint8)
+
+        c = (b * b - n) // A
+        for position in np.nonzero(sieve >= ctx.threshold)[0].tolist():
+            x = position - M
+            # Roots tell which sieved primes divide g(x)/A without dividing by all of them
+            x_mod = x % sieve_p
+            divisors = sieve_p[(x_mod == s1) | (x_mod == s2)].tolist()
+            _trial_divide(ctx, A, a_primes, b, c, x, unsieved + divisors, relations, partials)
+    return count
+
+def _trial_divide(ctx, A, a_primes, b, c, x, divisors, relations, partials):
+    """
+    Factors g(x)/A = A*x^2 + 2*b*x + c over the candidate divisors and records the relation
+    (A*x + b)^2 = A * g(x)/A (mod n) when the cofactor is 1 or a single large prime.
+    """
+    value = (A * x + 2 * b) * x + c
+    if value == 0:
+        return
+    factors = Counter(a_primes)
+    if value < 0:
+        factors[-1] = 1
+        value = -value
+    for q in divisors:
+        while value % q == 0:
+            value //= q
+            factors[q] += 1
+    u = A * x + b
+    if value == 1:
+        relations.append((u, dict(factors)))
+    elif value < ctx.large_prime_bound:
+        partials.append((value, u, dict(factors)))
+
+def _relation_batches(n, fb_size, M, workers):
+    """
+    Yields the (relations, partials, polynomials) results of sieve_polynomials forever,
+    keeping every worker busy on its own range of A values.
+    """
+    if workers == 1:
+        while True:
+            yield sieve_polynomials(n, fb_size, M, POLYNOMIALS_PER_TASK, random.getrandbits(64))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(sieve_polynomials, n, fb_size, M, POLYNOMIALS_PER_TASK, random.getrandbits(64))
+                   for _ in range(workers)}
+        try:
+            while True:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.add(executor.submit(sieve_polynomials, n, fb_size, M, POLYNOMIALS_PER_TASK,
+                                                random.getrandbits(64)))
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+def remove_singletons(rows):
+    """
+    Structured Gaussian elimination, pruning step: a column set in only one row can never cancel,
+    so that row cannot be part of a dependency. Returns the indices of the rows that survive.
+    """
+    active = list(range(len(rows)))
+    while True:
+        seen, seen_twice = 0, 0
+        for i in active:
+            seen_twice |= seen & rows[i]
+            seen |= rows[i]
+        singletons = seen & ~seen_twice
+        if not singletons:
+            return active
+        active = [i for i in active if not rows[i] & singletons]
+
+def find_dependencies(rows):
+    """
+    Gaussian elimination over GF(2) on rows packed into Python ints.
+    Returns a list of bitmasks over the row indices; the rows of each mask XOR to zero.
+    """
+    active = remove_singletons(rows)
+    pivots = {}
+    dependencies = []
+    for i in active:
+        row, history = rows[i], 1 << i
+        while row:
+            column = row.bit_length() - 1
+            if column not in pivots:
+                pivots[column] = (row, history)
+                break
+            pivot_row, pivot_history = pivots[column]
+            row ^= pivot_row
+            history ^= pivot_history
+        else:
+            dependencies.append(history)
+    return dependencies
+
+def _square_root(n, relations, dependency):
+    """
+    Combines the relations of one dependency into X^2 = Y^2 (mod n) and returns gcd(X - Y, n).
+    """
+    X = 1
+    exponents = Counter()
+    i = 0
+    while dependency:
+        if dependency & 1:
+            u, factors = relations[i]
+            X = X * u % n
+            exponents.update(factors)
+        dependency >>= 1
+        i += 1
+    Y = 1
+    for q, e in exponents.items():
+        if q != -1:
+            Y = Y * pow(q, e // 2, n) % n
+    return math.gcd(X - Y, n)
+
+def solve_relations(n, ctx, relations):
+    """
+    Linear algebra step: finds subsets of relations whose product is a square and tries each for a factor.
+    """
+    columns = {q: i + 1 for i, q in enumerate(ctx.primes)}
+    columns[-1] = 0
+    rows = []
+    for u, factors in relations:
+        row = 0
+        for q, e in factors.items():
+            if e % 2 and q in columns:
+                row |= 1 << columns[q]
+        rows.append(row)
+    dependencies = find_dependencies(rows)
+    print(f"SIQS: {len(dependencies)} dependencies from {len(relations)} relations")
+    for dependency in dependencies:
+        g = _square_root(n, relations, dependency)
+        if 1 < g < n:
+            return g
+    return None
+
+def siqs_factor(n, workers=None):
+    """
+    Self-initializing quadratic sieve with the single large prime variation.
+    Returns a non-trivial factor of n or None.
+    """
+    if n % 2 == 0:
+        return 2
+    root = math.isqrt(n)
+    if root * root == n:
+        return root
+    # The factor base must not contain a factor of n
+    for q in iter_primes(3, 1 << 17):
+        if n % q == 0:
+            return q
+    workers = workers or os.cpu_count() or 1
+    fb_size, M = siqs_parameters(n)
+    ctx = _get_context(n, fb_size, M)
+    needed = len(ctx.primes) + 1 + EXTRA_RELATIONS
+    print(f"SIQS: factor base of {len(ctx.primes)} primes up to {ctx.primes[-1]}, M={M}, "
+          f"threshold={ctx.threshold}, {workers} workers")
+
+    start = time.time()
+    relations = []
+    seen = set()
+    partials = {}
+    full, combined, polynomials = 0, 0, 0
+    last_report = start
+    batches = _relation_batches(n, fb_size, M, workers)
+    try:
+        for batch_relations, batch_partials, batch_polynomials in batches:
+            if not batch_polynomials:
+                print("SIQS: ran out of polynomials; n is too small for the factor base")
+                return None
+            polynomials += batch_polynomials
+            for u, factors in batch_relations:
+                if u not in seen:
+                    seen.add(u)
+                    relations.append((u, factors))
+                    full += 1
+            # Two partials with the same large prime L multiply to a full relation with L^2 on the right
+            for large_prime, u, factors in batch_partials:
+                if large_prime not in partials:
+                    partials[large_prime] = (u, factors)
+                    continue
+                u_other, factors_other = partials[large_prime]
+                if u_other == u:
+                    continue
+                u_combined = u * u_other % n
+                if u_combined in seen:
+                    continue
+                seen.add(u_combined)
+                merged = Counter(factors)
+                merged.update(factors_other)
+                merged[large_prime] += 2
+                relations.append((u_combined, dict(merged)))
+                combined += 1
+
+            if time.time() - last_report > 2 or len(relations) >= needed:
+                last_report = time.time()
+                print(f"SIQS: {len(relations)}/{needed} relations ({full} full, {combined} combined), "
+                      f"{polynomials} polynomials, {last_report - start:.1f} seconds")
+            if len(relations) >= needed:
+                factor = solve_relations(n, ctx, relations)
+                if factor:
+                    return factor
+                needed += EXTRA_RELATIONS
+    finally:
+        batches.close()
+    return None
+
+if __name__ == '__main__':
+    from rsa_from_scratch import getUnsafePrime
+    from crack_rsa import break_rsa_sympy
+    # SymPy's factorint has no quadratic sieve (rho, p-1 and ECM only); above 160 bits it takes far too long
+    SYMPY_MAX_BITS = 160
+    results = []
+    for bits in [100, 120, 140, 160, 180, 200]:
+        p = getUnsafePrime(bits // 2)
+        q = getUnsafePrime(bits // 2)
+        n = p * q
+        print(f"\n--- {n.bit_length()}-bit modulus ---")
+        start = time.time()
+        factor = siqs_factor(n)
+        siqs_time = time.time() - start
+        sympy_time = None
+        if bits <= SYMPY_MAX_BITS:
+            start = time.time()
+            break_rsa_sympy(n)
+            sympy_time = time.time() - start
+        results.append((bits, factor in (p, q), siqs_time, sympy_time))
+
+    print(f"\n{'Bits':>6} | {'SIQS ok':>7} | {'SIQS (s)':>10} | {'SymPy (s)':>10}")
+    for bits, ok, siqs_time, sympy_time in results:
+        sympy_column = f"{sympy_time:.4f}" if sympy_time is not None else "skipped"
+        print(f"{bits:>6} | {str(ok):>7} | {siqs_time:>10.4f} | {sympy_column:>10}")
@@ -0,0 +1,160 @@
+import math
+import random
+import time
+from prime_sieve import get_small_primes
+from primality import is_probable_prime
+
+try:
+    import gmpy2
+    mpz = gmpy2.mpz
+except ImportError:
+    gmpy2 = None
+    mpz = int
+
+DEFAULT_BOUND = 1 << 20
+STAGE2_MULTIPLIER = 100  # as in break_rsa_pollards_p1_iterative: B2 = 100 * B1
+
+# Memoized product trees over the primes up to a bound; level 0 holds the primes, the last level the primorial
+_prime_trees = {}
+
+def _gcd(a, b):
+    return gmpy2.gcd(a, b) if gmpy2 else math.gcd(a, b)
+
+def product_tree(values):
+    """
+    Levels of the product tree over values: level 0 is the values themselves, the last level their product.
+    """
+    levels = [[mpz(v) for v in values]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        levels.append([level[i] * level[i + 1] if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)])
+    return levels
+
+def remainder_tree(x, values):
+    """
+    x mod v for every v in values, pushing x down the product tree of the values instead of
+    reducing the (possibly huge) x separately against each of them.
+    """
+    if not values:
+        return []
+    levels = product_tree(values)
+    remainders = [mpz(x) % levels[-1][0]]
+    for level in reversed(levels[:-1]):
+        remainders = [remainders[i // 2] % node for i, node in enumerate(level)]
+    return remainders
+
+def prime_tree(bound):
+    if bound not in _prime_trees:
+        _prime_trees[bound] = product_tree(get_small_primes(bound))
+    return _prime_trees[bound]
+
+def smooth_parts(values, bound):
+    """
+    Bernstein's batch smoothness test: the largest divisor of each value whose prime factors are all <= bound.
+    The primorial P is reduced modulo every value through a remainder tree, then r = P mod v is squared
+    until its exponent reaches the bit length of v, so gcd(r^(2^e) mod v, v) collects the full prime powers.
+    """
+    primorial = prime_tree(bound)[-1][0]
+    parts = []
+    for v, r in zip(values, remainder_tree(primorial, values)):
+        v = mpz(v)
+        for _ in range(v.bit_length().bit_length()):
+            r = r * r % v
+        parts.append(int(_gcd(r, v)))
+    return parts
+
+def prime_factors_below(value, bound):
+    """
+    {prime: exponent} for the primes <= bound dividing value, found by descending the prime product tree
+    into the subtrees that share a factor with value, then dividing out each prime repeatedly.
+    """
+    levels = prime_tree(bound)
+    value = mpz(value)
+    nodes = [0]
+    for level in range(len(levels) - 1, 0, -1):
+        children = levels[level - 1]
+        nodes = [c for i in nodes for c in (2 * i, 2 * i + 1) if c < len(children) and _gcd(value, children[c]) != 1]
+    factors = {}
+    for i in nodes:
+        p = int(levels[0][i])
+        while value % p == 0:
+            value //= p
+            factors[p] = factors.get(p, 0) + 1
+    return factors
+
+def smoothness_bounds(factors):
+    """
+    Pollard p-1 bounds needed for a value with the given {prime: exponent} factorization:
+    B1 for stage 1 alone (the largest prime power), and the (B1, B2) pair when the largest prime
+    is left to stage 2 (possible only when it divides the value once).
+    """
+    largest = max(factors)
+    stage1 = max(p ** e for p, e in factors.items())
+    if factors[largest] > 1:
+        return stage1, stage1, stage1
+    b1 = max((p ** e for p, e in factors.items() if p != largest), default=1)
+    # A prime power of the rest can exceed the largest prime, which stage 1 then covers already
+    return stage1, b1, max(b1, largest)
+
+def certify(values, bound=DEFAULT_BOUND, stage2_bound=None):
+    """
+    Smoothness certificates for many values at once (typically p-1 of many primes), without factoring them.
+    A value is smooth when all its prime factors are <= bound, except at most one prime <= stage2_bound
+    (default STAGE2_MULTIPLIER * bound) that Pollard's stage 2 would catch. Returns one dict per value:
+    {'value', 'smooth', 'factors', 'cofactor'} plus 'max_prime', 'max_prime_power' (also the B1 that
+    stage 1 alone would need), and the stage 1 + stage 2 bounds 'b1' and 'b2' for smooth values.
+    """
+    stage2_bound = stage2_bound or STAGE2_MULTIPLIER * bound
+    certificates = []
+    for value, part in zip(values, smooth_parts(values, bound)):
+        factors = prime_factors_below(part, bound) if part > 1 else {}
+        cofactor = value // part
+        if 1 < cofactor <= stage2_bound and is_probable_prime(cofactor):
+            factors[cofactor] = 1
+            cofactor = 1
+        certificate = {'value': value, 'smooth': cofactor == 1, 'factors': factors, 'cofactor': cofactor}
+        if cofactor == 1 and factors:
+            stage1, b1, b2 = smoothness_bounds(factors)
+            certificate.update({'max_prime': max(factors), 'max_prime_power': stage1, 'b1': b1, 'b2': b2})
+        certificates.append(certificate)
+    return certificates
+
+def is_p1_weak(primes, bound=DEFAULT_BOUND, stage2_bound=None):
+    """
+    For each prime, whether Pollard's p-1 with B1 = bound and B2 = stage2_bound would find it.
+    """
+    stage2_bound = stage2_bound or STAGE2_MULTIPLIER * bound
+    return [c['smooth'] and c['b1'] <= bound and c['b2'] <= stage2_bound
+            for c in certify([p - 1 for p in primes], bound, stage2_bound)]
+
+if __name__ == '__main__':
+    from sympy import factorint
+    from rsa_from_scratch import getPrimeSmoothFactored, getUnsafePrime
+    bits = 256
+    bound = DEFAULT_BOUND
+    print(f"Generating {bits}-bit primes: smooth (p-1 built from small primes) and random")
+    smooth = [getPrimeSmoothFactored(bits) for _ in range(10)]
+    primes = [p for p, _ in smooth] + [getUnsafePrime(bits) for _ in range(990)]
+    random.shuffle(primes)
+    expected = {p: factors for p, factors in smooth}
+
+    start = time.time()
+    prime_tree(bound)
+    print(f"Prime product tree up to {bound}: {time.time() - start:.4f} seconds")
+
+    start = time.time()
+    certificates = certify([p - 1 for p in primes], bound)
+    batch_time = time.time() - start
+    found = {c['value'] + 1: c for c in certificates if c['smooth']}
+    correct = all(p in found and found[p]['factors'] == dict(factors) for p, factors in expected.items())
+    print(f"Batch certification of {len(primes)} values: {batch_time:.4f} seconds, {len(found)} smooth, "
+          f"all {len(expected)} generated smooth primes found with the right factors={correct}")
+    for p, c in list(found.items())[:3]:
+        print(f"  p-1 needs B1={c['b1']}, B2={c['b2']} (stage 1 alone: B1={c['max_prime_power']})")
+
+    # Only the smooth values: factorint on a random p-1 can run for hours
+    start = time.time()
+    for p in expected:
+        factorint(p - 1)
+    print(f"SymPy factorint on the smooth values alone: {(time.time() - start) / len(expected):.4f} seconds per value "
+          f"(batch: {batch_time / len(primes):.6f} seconds per value)")
@@ -0,0 +1,132 @@
+import bisect
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from prime_sieve import get_small_primes
+
+try:
+    import gmpy2
+    mpz = gmpy2.mpz
+except ImportError:
+    gmpy2 = None
+    mpz = int
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TABLE_LIMIT = 1 << 22        # primes from the shared sieve; beyond this the mod-30 wheel takes over
+CHUNK_PRIMES = 1024          # primes per precomputed product, checked with a single gcd
+WHEEL = (1, 7, 11, 13, 17, 19, 23, 29)
+WHEEL_BATCH = 1 << 16        # wheel candidates per vectorized batch
+NUMPY_WHEEL_LIMIT = 1 << 47  # remainders are computed in 16-bit limbs, so candidates must stay below 2^47
+PARALLEL_MIN_CANDIDATES = 1 << 24
+
+# Memoized products of consecutive CHUNK_PRIMES table primes
+_chunk_products = []
+
+def _chunk_product(index, primes):
+    """
+    Product of chunk 'index' of the full prime table 'primes'.
+    """
+    while len(_chunk_products) <= index:
+        chunk = primes[len(_chunk_products) * CHUNK_PRIMES:(len(_chunk_products) + 1) * CHUNK_PRIMES]
+        _chunk_products.append(math.prod(mpz(p) for p in chunk))
+    return _chunk_products[index]
+
+def table_divisor(n, limit):
+    """
+    Smallest table prime <= limit dividing n, or None. Each chunk of primes is checked with one gcd
+    against its memoized product; only a chunk with a common factor is scanned prime by prime.
+    """
+    primes = get_small_primes(TABLE_LIMIT)
+    for index in range(0, (bisect.bisect_right(primes, limit) + CHUNK_PRIMES - 1) // CHUNK_PRIMES):
+        g = gmpy2.gcd(n, _chunk_product(index, primes)) if gmpy2 else math.gcd(n, _chunk_product(index, primes))
+        if g != 1:
+            for p in primes[index * CHUNK_PRIMES:(index + 1) * CHUNK_PRIMES]:
+                if n % p == 0:
+                    return p
+    return None
+
+def wheel_divisor(n, start, stop):
+    """
+    Smallest number in [start, stop) coprime to 30 that divides n, or None; start is a multiple of 30.
+    With NumPy a batch of candidates is reduced at once: n is fed in 16-bit limbs through r = (r * 2^16 + limb) mod c.
+    """
+    if np is None or stop >= NUMPY_WHEEL_LIMIT:
+        for base in range(start, stop, 30):
+            for offset in WHEEL:
+                if n % (base + offset) == 0:
+                    return base + offset
+        return None
+    limbs = [(n >> shift) & 0xFFFF for shift in range((n.bit_length() - 1) // 16 * 16, -1, -16)]
+    offsets = np.array(WHEEL, dtype=np.int64)
+    step = 30 * (WHEEL_BATCH // len(WHEEL))
+    for block in range(start, stop, step):
+        candidates = (np.arange(block, min(block + step, stop), 30, dtype=np.int64)[:, None] + offsets).ravel()
+        remainders = np.zeros_like(candidates)
+        for limb in limbs:
+            remainders = (remainders * 65536 + limb) % candidates
+        hits = np.flatnonzero(remainders == 0)
+        if len(hits):
+            return int(candidates[hits[0]])
+    return None
+
+def trial_division(n, limit=None, workers=None):
+    """
+    Trial division up to limit (default isqrt(n)): the shared prime table first, then a mod-30 wheel.
+    Large wheel ranges are split across worker processes. Returns a non-trivial factor or None.
+    """
+    limit = limit or math.isqrt(n)
+    p = table_divisor(n, limit)
+    if p is not None:
+        return p if p < n else None
+    if limit <= TABLE_LIMIT:
+        return None
+
+    start = TABLE_LIMIT // 30 * 30
+    stop = limit + 1
+    workers = workers or os.cpu_count() or 1
+    print(f"Trial division: no factor up to {TABLE_LIMIT}, continuing with the mod-30 wheel up to {limit}")
+    if workers == 1 or (stop - start) * len(WHEEL) // 30 < PARALLEL_MIN_CANDIDATES:
+        p = wheel_divisor(n, start, stop)
+    else:
+        p = _wheel_divisor_parallel(n, start, stop, workers)
+    return p if p is not None and 1 < p < n else None
+
+def _wheel_divisor_parallel(n, start, stop, workers):
+    step = -(-(stop - start) // (4 * workers * 30)) * 30
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(wheel_divisor, n, lo, min(lo + step, stop)) for lo in range(start, stop, step)}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    p = future.result()
+                    if p is not None:
+                        return p
+        finally:
+            for future in pending:
+                future.cancel()
+    return None
+
+if __name__ == '__main__':
+    from rsa_from_scratch import getUnsafePrime
+    NAIVE_MAX_BITS = 28  # the old break_rsa_trial_division loop, for comparison
+    for bits in [8, 16, 20, 24, 28, 32]:
+        p = getUnsafePrime(bits)
+        q = getUnsafePrime(bits)
+        n = p * q
+        start = time.time()
+        factor = trial_division(n)
+        engine_time = time.time() - start
+        naive = "skipped"
+        if bits <= NAIVE_MAX_BITS:
+            start = time.time()
+            i = 2
+            while n % i:
+                i += 1
+            naive = f"{time.time() - start:.4f} s"
+        print(f"{bits}-bit primes: correct={factor in (p, q)}, engine={engine_time:.4f} s, naive n % i loop={naive}")
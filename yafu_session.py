@@ -0,0 +1,233 @@
+import itertools
+import os
+import queue
+import re
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# Command that starts YAFU in interactive mode, e.g. YAFU_PATH="/opt/yafu/yafu" or YAFU_PATH="python3 yafu_stub.py"
+YAFU_PATH = os.environ.get('YAFU_PATH', 'yafu')
+YAFU_WORKERS = int(os.environ.get('YAFU_WORKERS', 1))
+STARTUP_TIMEOUT = 30
+FACTOR_TIMEOUT = 600
+ISPRIME_TIMEOUT = 30
+
+FACTOR_LINE = re.compile(r'\b(?:PRP|P|C)\d+ = (\d+)')
+ANSWER_LINE = re.compile(r'\bans = (-?\d+)')
+# Job results are delimited by asking YAFU to evaluate a marker number, echoed back as "ans = <marker>"
+SENTINEL_BASE = 7 * 10 ** 30
+
+class YafuError(Exception):
+    pass
+
+class YafuTimeout(YafuError):
+    pass
+
+def yafu_command():
+    command = shlex.split(YAFU_PATH)
+    # YAFU block-buffers stdout on a pipe; force line buffering so results stream out as they are printed
+    if shutil.which('stdbuf'):
+        command = ['stdbuf', '-oL'] + command
+    return command
+
+def yafu_available():
+    command = shlex.split(YAFU_PATH)
+    return bool(command) and shutil.which(command[0]) is not None
+
+class YafuSession:
+    """
+    One long-lived YAFU process in interactive mode. Expressions are written to its stdin one per line;
+    a reader thread streams stdout into a queue, and each job's output ends at its sentinel answer.
+    """
+
+    _sentinels = itertools.count(1)
+
+    def __init__(self):
+        self.process = None
+        self.lines = None
+
+    def start(self):
+        if not yafu_available():
+            raise FileNotFoundError(YAFU_PATH)
+        # Own session, so a timeout can kill YAFU together with any helper processes it started
+        self.process = subprocess.Popen(yafu_command(), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, text=True, bufsize=1, start_new_session=True)
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read, args=(self.process.stdout, self.lines), daemon=True).start()
+        self.run(None, STARTUP_TIMEOUT)  # skip the banner and make sure YAFU answers
+
+    @staticmethod
+    def _read(stream, lines):
+        for line in stream:
+            lines.put(line)
+        lines.put(None)
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def run(self, expression, timeout):
+        """
+        Sends one expression and returns YAFU's output lines for it.
+        Raises YafuTimeout (after killing this process) if the answer does not arrive in time.
+        """
+        if not self.alive() and expression is not None:
+            self.start()
+        sentinel = SENTINEL_BASE + next(self._sentinels)
+        script = (f"{expression}\n" if expression is not None else "") + f"{sentinel}\n"
+        try:
+            self.process.stdin.write(script)
+            self.process.stdin.flush()
+        except OSError as e:
+            self.close()
+            raise YafuError(f"YAFU is not accepting input: {e}")
+
+        label = expression if expression is not None else "startup"
+        deadline = time.time() + timeout
+        output = []
+        while True:
+            try:
+                line = self.lines.get(timeout=max(0, deadline - time.time()))
+            except queue.Empty:
+                self.close()
+                raise YafuTimeout(f"YAFU did not finish '{label}' within {timeout} seconds")
+            if line is None:
+                self.close()
+                raise YafuError(f"YAFU exited while running '{label}': {''.join(output[-5:])}")
+            answer = ANSWER_LINE.search(line)
+            if answer and int(answer.group(1)) == sentinel:
+                return output
+            output.append(line)
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            self.process.wait(2)
+        except ProcessLookupError:
+            pass
+        except subprocess.TimeoutExpired:
+            os.killpg(self.process.pid, signal.SIGKILL)
+            self.process.wait()
+        self.process = None
+
+class YafuPool:
+    """
+    A fixed number of YAFU sessions shared by threads. A job borrows an idle session; when a job
+    times out only that session's process is killed, and it is restarted on its next job.
+    """
+
+    def __init__(self, size=YAFU_WORKERS):
+        self.idle = queue.Queue()
+        for _ in range(size):
+            self.idle.put(YafuSession())
+
+    def run(self, expression, timeout):
+        session = self.idle.get()
+        try:
+            return session.run(expression, timeout)
+        finally:
+            self.idle.put(session)
+
+    def close(self):
+        """
+        Stops the idle sessions' processes; the sessions stay in the pool and restart on their next job.
+        """
+        for session in list(self.idle.queue):
+            session.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = YafuPool()
+        return _pool
+
+def yafu_factor(n, timeout=FACTOR_TIMEOUT):
+    """
+    Factors n with the shared YAFU pool. Returns {factor: exponent} like sympy.factorint
+    ({} if YAFU could not split n), or None if YAFU is unavailable, failed or timed out.
+    """
+    try:
+        output = get_pool().run(f"factor({n})", timeout)
+    except FileNotFoundError:
+        print(f"YAFU command '{YAFU_PATH}' not found. Please install it or set YAFU_PATH.")
+        return None
+    except YafuError as e:
+        print(e)
+        return None
+    factors = {}
+    for line in output:
+        match = FACTOR_LINE.search(line)
+        if match:
+            factor = int(match.group(1))
+            if factor > 1:
+                factors[factor] = factors.get(factor, 0) + 1
+    if list(factors) == [n]:
+        return {}
+    return factors
+
+def yafu_isprime(n, timeout=ISPRIME_TIMEOUT):
+    """
+    YAFU's isprime(n) through the shared pool. Returns True/False, or None if YAFU is unavailable or failed.
+    """
+    try:
+        output = get_pool().run(f"isprime({n})", timeout)
+    except FileNotFoundError:
+        return None
+    except YafuError as e:
+        print(e)
+        return None
+    answers = [ANSWER_LINE.search(line) for line in output]
+    answers = [int(a.group(1)) for a in answers if a]
+    return bool(answers and answers[-1])
+
+if __name__ == '__main__':
+    from concurrent.futures import ThreadPoolExecutor
+    from sympy import factorint
+    from rsa_from_scratch import getUnsafePrime
+
+    stub = f"{shlex.quote(sys.executable)} {shlex.quote(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'yafu_stub.py'))}"
+
+    # Session checks against the stub: factor lines and answers parsed up to each job's sentinel,
+    # back-to-back jobs kept apart, and a job over its timeout killed and the session restarted
+    yafu_path, YAFU_PATH = YAFU_PATH, stub
+    n = 2 ** 3 * 3 * 1000003 ** 2
+    assert yafu_factor(n) == factorint(n), yafu_factor(n)
+    assert yafu_isprime(1000003) is True and yafu_isprime(1000005) is False
+    session = YafuSession()
+    try:
+        session.run("sleep(10)", 1)
+        raise AssertionError("the slow job did not time out")
+    except YafuTimeout:
+        assert not session.alive()
+    assert [line.strip() for line in session.run("factor(15)", 30) if FACTOR_LINE.search(line)] == ["P1 = 3", "P1 = 5"]
+    session.close()
+    get_pool().close()
+    print("Stub checks passed: factor lines, isprime answers, sentinels and timeouts")
+    YAFU_PATH = yafu_path
+
+    if not yafu_available():
+        print(f"'{YAFU_PATH}' not found, using the stub (YAFU_PATH=\"python3 yafu_stub.py\")")
+        YAFU_PATH = stub
+    numbers = [getUnsafePrime(24) * getUnsafePrime(24) for _ in range(20)]
+
+    start = time.time()
+    for n in numbers:
+        subprocess.run(yafu_command() + [f"factor({n})"], capture_output=True, text=True, timeout=FACTOR_TIMEOUT)
+    print(f"One process per call: {time.time() - start:.4f} seconds for {len(numbers)} factorizations")
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=YAFU_WORKERS) as executor:
+        results = list(executor.map(yafu_factor, numbers))
+    print(f"Persistent session ({YAFU_WORKERS} workers): {time.time() - start:.4f} seconds, "
+          f"all correct={all(len(r) == 2 for r in results)}")
+    get_pool().close()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Minimal stand-in for YAFU, for exercising yafu_session without the real tool:
+    YAFU_PATH="python3 yafu_stub.py" python3 yafu_session.py
+Understands factor(n), isprime(n), plain integers and sleep(seconds) (a job that is slow on purpose,
+for timeout checks), from the command line (one-shot)
+or from stdin (interactive), and prints results in YAFU's "P<digits> = p" / "ans = x" format.
+"""
+import re
+import sys
+import time
+from sympy import factorint, isprime
+
+def evaluate(expression):
+    match = re.fullmatch(r'(factor|isprime|sleep)\((\d+)\)|(-?\d+)', expression.strip())
+    if not match:
+        print(f"unrecognized expression: {expression.strip()}")
+        return
+    function, argument, literal = match.groups()
+    if literal is not None:
+        print(f"ans = {literal}")
+    elif function == 'sleep':
+        time.sleep(int(argument))
+        print("ans = 0")
+    elif function == 'isprime':
+        print(f"ans = {1 if isprime(int(argument)) else 0}")
+    else:
+        print("***factors found***\n")
+        for p, e in sorted(factorint(int(argument)).items()):
+            for _ in range(e):
+                print(f"P{len(str(p))} = {p}")
+        print("\nans = 1")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        evaluate(sys.argv[1])
+    else:
+        print("YAFU stub (interactive mode)")
+        for line in sys.stdin:
+            if line.strip():
+                evaluate(line)
+                sys.stdout.flush()